@@ -0,0 +1,78 @@
+# Start-up cost of the package: wall time of each import in a fresh interpreter and the
+# heavy libraries it pulls in
+#
+#   python benchmarks/import_time.py
+#   python benchmarks/import_time.py --max-seconds 0.1   (exit code 1 if the bare import is slower)
+#   python -X importtime -c "import osm_etl_library"      (per-module breakdown)
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pandas', 'numpy', 'openpyxl', 'matplotlib', 'matplotlib.pyplot', 'pyarrow']
+
+# pandas itself loads pyarrow, when installed, for its string dtype
+PANDAS = ['pandas', 'numpy', 'pyarrow']
+
+# Each statement with the heavy modules it is allowed to load
+IMPORTS = {
+    'import osm_etl_library': [],
+    'from osm_etl_library import FolderCreatorPipeline': [],
+    'from osm_etl_library import RunReport': [],
+    'from osm_etl_library import CSVLoader': PANDAS,
+    'from osm_etl_library import Pipeline': PANDAS,
+    'from osm_etl_library import ExcelWriter': PANDAS + ['openpyxl'],
+    'from osm_etl_library import ChartBuilderPipeline': PANDAS + ['openpyxl'],
+}
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(statement: str, repeat: int) -> dict:
+
+    runs = []
+
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_MODULES)], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output))
+
+    return {'seconds': min(run['seconds'] for run in runs), 'loaded': runs[0]['loaded']}
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Measure osm_etl_library import time in fresh interpreters.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per statement; the fastest is reported")
+    parser.add_argument('--max-seconds', type=float, default=None, help="fail if the bare package import is slower than this")
+    args = parser.parse_args()
+
+    failed = False
+
+    print(f"{'statement':<55} {'seconds':>8}  heavy modules loaded")
+
+    for statement, allowed in IMPORTS.items():
+
+        result = measure(statement, args.repeat)
+
+        unexpected = [module for module in result['loaded'] if module.split('.')[0] not in allowed]
+
+        print(f"{statement:<55} {result['seconds']:8.3f}  {', '.join(result['loaded']) or '-'}" + (f"  <-- unexpected: {', '.join(unexpected)}" if unexpected else ""))
+
+        failed = failed or bool(unexpected)
+
+        if statement == 'import osm_etl_library' and args.max_seconds is not None and result['seconds'] > args.max_seconds:
+            print(f"Bare import took {result['seconds']:.3f} s, above the {args.max_seconds} s limit.")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
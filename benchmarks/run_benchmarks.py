@@ -0,0 +1,151 @@
+# Benchmarks for the ETL pipeline stages on synthetic FME-style data
+#
+#   python benchmarks/run_benchmarks.py --scales 10000 100000 1000000 --output results.json
+#   python benchmarks/run_benchmarks.py --output new.json --compare results.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from synthetic_data import generate_area
+from osm_etl_library import (
+    AttributionFolderCreator, ChartFolderCreator, FolderCreatorPipeline, CSVLoader, AreaDataCache, AreaStatistics,
+    TransformPipelineReport, TransformPipelineCharts, ChartBuilderPipeline, ExcelWriter, StreamingExcelWriter,
+    ExcelFormatterPipeline, SinglePassExcelFormatter
+)
+from osm_etl_library.RunManifest import code_version
+
+AREA = 'benchmark'
+
+def measure(stage: str, func, memory: bool) -> tuple:
+
+    if memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+
+    peak = None
+
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print(f"  {stage:<20} {seconds:10.3f} s" + (f" {peak / 1024**2:10.1f} MB peak" if peak is not None else ""))
+
+    return value, {'stage': stage, 'seconds': seconds, 'peak_bytes': peak}
+
+def run_scale(rows: int, args) -> list:
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as folder_path:
+
+        generate_area(folder_path, AREA, rows, args.feature_types, args.sparsity, args.cardinality, args.extra_tags, args.seed)
+
+        FolderCreatorPipeline([AttributionFolderCreator(folder_path), ChartFolderCreator(folder_path, [AREA])]).create_folders()
+
+        data_report = fr"{folder_path}\reports\osm_data_report.xlsx"
+        chart_report = fr"{folder_path}\reports\osm_category_charts.xlsx"
+
+        cache = AreaDataCache(folder_path, None)
+
+        stages = [
+            ('load', lambda: cache.get(AREA)),
+            ('statistics', lambda: cache.get_statistics(AREA)),
+            ('transform', lambda: (TransformPipelineReport(folder_path, [AREA], cache).run_transforms(), TransformPipelineCharts(folder_path, [AREA], cache).run_transforms())),
+        ]
+
+        reports = None
+
+        for stage, func in stages:
+            value, result = measure(stage, func, args.memory)
+            results.append(result)
+            if stage == 'transform':
+                reports = value
+
+        excel_dict, excel_dict_charts = reports
+
+        later_stages = [
+            ('write', lambda: (ExcelWriter(excel_dict, data_report).write_dataframes(), ExcelWriter(excel_dict_charts, chart_report).write_dataframes())),
+            ('charts', lambda: ChartBuilderPipeline(folder_path, [AREA], cache, save_png=False).run_transforms()),
+            ('format', lambda: ExcelFormatterPipeline(data_report).format_excel()),
+            ('format_single_pass', lambda: SinglePassExcelFormatter(data_report).format_excel()),
+            ('streaming_write', lambda: StreamingExcelWriter(excel_dict, fr"{folder_path}\reports\streamed.xlsx").write_dataframes()),
+            ('load_concurrent', lambda: CSVLoader(folder_path, AREA, concurrent_tables=True).load_dataframes()),
+        ]
+
+        if args.chunksize:
+            later_stages.append(('streaming_statistics', lambda: AreaStatistics.from_chunks(CSVLoader(folder_path, AREA), args.chunksize)))
+
+        for stage, func in later_stages:
+            results.append(measure(stage, func, args.memory)[1])
+
+    for result in results:
+        result['rows'] = rows
+
+    return results
+
+def compare(results: list, baseline_path: str):
+
+    with open(baseline_path) as f:
+        baseline = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+
+    print(f"\n{'rows':>10} {'stage':<20} {'baseline s':>12} {'current s':>12} {'ratio':>8}")
+
+    for result in results:
+        old = baseline.get((result['rows'], result['stage']))
+        if old is None:
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] else float('nan')
+        flag = '  <-- slower' if ratio > 1.1 else ''
+        print(f"{result['rows']:>10} {result['stage']:<20} {old['seconds']:12.3f} {result['seconds']:12.3f} {ratio:8.2f}{flag}")
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Time and memory-profile each pipeline stage on synthetic data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help="total rows per run, e.g. 10000 ... 10000000")
+    parser.add_argument('--feature-types', type=int, default=16)
+    parser.add_argument('--sparsity', type=float, default=0.7)
+    parser.add_argument('--cardinality', type=int, default=50)
+    parser.add_argument('--extra-tags', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=None, help="also time the chunked streaming statistics")
+    parser.add_argument('--memory', action='store_true', help="record tracemalloc peaks (slows every stage down)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = []
+
+    for rows in args.scales:
+        print(f"{rows} rows")
+        results.extend(run_scale(rows, args))
+
+    meta = {
+        'code_version': code_version(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Synthetic FME-style OSM tables for benchmarking
+
+import os
+import numpy as np
+import pandas as pd
+
+TABLE_SHARES = {'points': 0.5, 'lines': 0.25, 'areas': 0.2, 'collections': 0.05}
+
+BASE_FEATURE_TYPES = [
+    'amenity', 'highway', 'building', 'shop', 'natural', 'landuse', 'leisure', 'tourism',
+    'railway', 'waterway', 'place', 'power', 'barrier', 'man_made', 'office', 'historic'
+]
+
+def feature_type_names(feature_types: int) -> list:
+    names = BASE_FEATURE_TYPES[:feature_types]
+    names += [f"tag_{i}" for i in range(feature_types - len(names))]
+    return names + ['unknown']
+
+def zipf_choice(rng, size: int, n: int, exponent: float = 1.2) -> np.ndarray:
+
+    # Indices in [0, n) with a Zipf-like skew, as real tag values have
+
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+def generate_table(rng, rows: int, start_id: int, feature_types: list, sparsity: float, cardinality: int, extra_tags: int) -> pd.DataFrame:
+
+    feature = np.array(feature_types, dtype=object)[zipf_choice(rng, rows, len(feature_types), 0.8)]
+
+    data = {'osm_id': np.arange(start_id, start_id + rows), 'feature_type': feature}
+
+    def sparse(values, fill):
+        return np.where(rng.random(rows) < fill, values, None)
+
+    data['name'] = sparse(np.char.add('name ', zipf_choice(rng, rows, cardinality * 10).astype(str)), 1 - sparsity)
+    data['name:en'] = sparse(np.char.add('name en ', zipf_choice(rng, rows, cardinality).astype(str)), (1 - sparsity) / 4)
+    data['addr:street'] = sparse(np.char.add('street ', zipf_choice(rng, rows, cardinality).astype(str)), (1 - sparsity) / 2)
+
+    for name in feature_types[:-1]:
+        values = np.char.add(f"{name}_", zipf_choice(rng, rows, cardinality).astype(str))
+        data[name] = np.where(feature == name, values, sparse(values, sparsity / 50))
+
+    for i in range(extra_tags):
+        data[f"extra:{i}"] = sparse(np.char.add('v', zipf_choice(rng, rows, cardinality).astype(str)), (1 - sparsity) / 10)
+
+    return pd.DataFrame(data)
+
+def generate_area(folder_path: str, area: str, rows: int, feature_types: int = 16, sparsity: float = 0.7, cardinality: int = 50, extra_tags: int = 20, seed: int = 0, chunk_rows: int = 500_000) -> dict:
+
+    """Writes {folder_path}\\tables\\{area}_points|lines|areas|collections.csv.
+
+    rows is the total across the four tables. feature_types sets how many distinct
+    feature types (and matching tag columns) exist, sparsity the share of empty name
+    and extra-tag cells, and cardinality the number of distinct values per tag. Large
+    tables are written in chunks of chunk_rows so generation memory stays bounded.
+    Returns the number of rows written per table.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    names = feature_type_names(feature_types)
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    written = {}
+    start_id = 0
+
+    for table, share in TABLE_SHARES.items():
+
+        table_rows = max(int(rows * share), 1)
+        path = fr"{folder_path}\tables\{area}_{table}.csv"
+
+        for offset in range(0, table_rows, chunk_rows):
+            size = min(chunk_rows, table_rows - offset)
+            df = generate_table(rng, size, start_id, names, sparsity, cardinality, extra_tags)
+            df.to_csv(path, mode='w' if offset == 0 else 'a', header=offset == 0, index=False)
+            start_id += size
+
+        written[table] = table_rows
+
+    return written
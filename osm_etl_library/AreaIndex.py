@@ -0,0 +1,266 @@
+import os
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+from contextlib import closing
+from .DataAggregator import AreaStatistics, COMPLETENESS_KEYS
+from .DataLoader import make_loader
+from .PandasDtypes import dtype_proxy, cast_value
+
+# Classes for a local SQLite index of the areas
+
+INSERT_BATCH_ROWS = 50_000
+
+ATTRIBUTE_QUERY_BATCH = 100
+
+def quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+class AreaIndex:
+
+    """Local SQLite database holding every ingested area as one indexed table.
+
+    ingest() loads an area through make_loader and stores its frame row by row in a
+    table of its own, with indexes on feature_type and on each completeness key. The
+    pandas dtype of every column is kept alongside, so values read back are the values
+    the frame held. Columns are declared without a type, so SQLite keeps each value's
+    own type; booleans of object columns are stored as one-byte blobs to tell them apart
+    from integers.
+
+    statistics() builds an area's AreaStatistics from SQL aggregates alone, giving the
+    same reports as the pandas path, and completeness() answers filtered questions such
+    as the name completeness of one feature type. ensure() only re-ingests an area whose
+    source files changed size or mtime, so repeated reports never reparse the tables.
+    """
+
+    def __init__(self, folder_path: str, database_path: str = None, loader_options: dict = None):
+        self.folder_path = folder_path
+        self.database_path = database_path or fr"{folder_path}\index\osm_areas.sqlite"
+        self.loader_options = loader_options or {}
+
+    def connect(self) -> sqlite3.Connection:
+
+        # The index directory does not exist before the first run
+
+        os.makedirs(os.path.dirname(self.database_path) or '.', exist_ok=True)
+
+        conn = sqlite3.connect(self.database_path, timeout=60)
+
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS areas (area TEXT PRIMARY KEY, table_name TEXT, row_count INTEGER, sources TEXT, table_stats TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS area_columns (area TEXT, position INTEGER, column_name TEXT, dtype TEXT, PRIMARY KEY (area, position))")
+
+        return conn
+
+    def loader(self, area: str):
+
+        # The index always stores the full dense frame, whatever the run's representation
+
+        options = dict(self.loader_options, columns=None, compact=False, representation='dense')
+
+        return make_loader(self.folder_path, area, **options)
+
+    @staticmethod
+    def sources(loader) -> dict:
+
+        sources = {}
+
+        for source_path in loader.source_files():
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                continue
+            sources[source_path] = [stat.st_size, stat.st_mtime_ns]
+
+        return sources
+
+    def is_current(self, area: str, loader = None) -> bool:
+
+        loader = loader or self.loader(area)
+
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT sources FROM areas WHERE area = ?", (area,)).fetchone()
+
+        return row is not None and json.loads(row[0]) == self.sources(loader)
+
+    def ensure(self, area: str):
+
+        # Returns the loader, with the table_stats of the ingest that built the index
+
+        loader = self.loader(area)
+
+        if not self.is_current(area, loader):
+            return self.ingest(area, loader)
+
+        with closing(self.connect()) as conn:
+            loader.table_stats = json.loads(conn.execute("SELECT table_stats FROM areas WHERE area = ?", (area,)).fetchone()[0])
+
+        return loader
+
+    def ingest(self, area: str, loader = None):
+
+        loader = loader or self.loader(area)
+
+        sources = self.sources(loader)
+
+        df = loader.load_dataframes()
+
+        table_name = f"area_{area}"
+
+        with closing(self.connect()) as conn, conn:
+
+            conn.execute(f"DROP TABLE IF EXISTS {quote(table_name)}")
+            conn.execute("DELETE FROM area_columns WHERE area = ?", (area,))
+
+            conn.execute(f"CREATE TABLE {quote(table_name)} ({', '.join(quote(column) for column in df.columns)})")
+
+            conn.executemany("INSERT INTO area_columns VALUES (?, ?, ?, ?)", [(area, i, column, str(df[column].dtype)) for i, column in enumerate(df.columns)])
+
+            columns = [self.encode(df[column]) for column in df.columns]
+
+            insert = f"INSERT INTO {quote(table_name)} VALUES ({', '.join('?' * len(df.columns))})"
+
+            for start in range(0, len(df), INSERT_BATCH_ROWS):
+                conn.executemany(insert, zip(*(column[start:start + INSERT_BATCH_ROWS] for column in columns)))
+
+            for column in ['feature_type'] + COMPLETENESS_KEYS:
+                if column in df.columns:
+                    conn.execute(f"CREATE INDEX {quote(f'{table_name}_{column}')} ON {quote(table_name)} ({quote(column)})")
+
+            conn.execute("INSERT OR REPLACE INTO areas VALUES (?, ?, ?, ?, ?)", (area, table_name, len(df), json.dumps(sources), json.dumps(loader.table_stats)))
+
+        print(f"step: index_area, ✅ Indexed {len(df)} rows of {area}.")
+
+        return loader
+
+    @staticmethod
+    def encode(column: pd.Series) -> list:
+
+        def encode_value(value):
+            if pd.isna(value):
+                return None
+            if isinstance(value, np.generic):
+                value = value.item()
+            if isinstance(value, bool) and str(column.dtype) == 'object':
+                return b'\x01' if value else b'\x00'
+            return value
+
+        return [encode_value(value) for value in column.tolist()]
+
+    @staticmethod
+    def decode(value, dtype: str):
+
+        if value is None:
+            return np.nan
+
+        if isinstance(value, bytes):
+            return value == b'\x01'
+
+        return cast_value(value, dtype)
+
+    def _area(self, conn: sqlite3.Connection, area: str) -> tuple:
+
+        row = conn.execute("SELECT table_name, row_count FROM areas WHERE area = ?", (area,)).fetchone()
+
+        if row is None:
+            raise KeyError(f"{area} is not in the index {self.database_path}")
+
+        dtypes = dict(conn.execute("SELECT column_name, dtype FROM area_columns WHERE area = ? ORDER BY position", (area,)).fetchall())
+
+        return quote(row[0]), row[1], dtypes
+
+    def completeness(self, area: str, feature_type: str = None) -> dict:
+
+        # Row count and completeness-key counts, optionally for a single feature type
+
+        with closing(self.connect()) as conn:
+
+            table, _, dtypes = self._area(conn, area)
+
+            keys = [key for key in COMPLETENESS_KEYS if key in dtypes]
+
+            query = f"SELECT COUNT(*){''.join(f', COUNT({quote(key)})' for key in keys)} FROM {table}"
+
+            if feature_type is None:
+                counts = conn.execute(query).fetchone()
+            else:
+                counts = conn.execute(f"{query} WHERE feature_type = ?", (feature_type,)).fetchone()
+
+        result = {'row_count': counts[0]}
+        result.update({key: 0 for key in COMPLETENESS_KEYS})
+        result.update(zip(keys, counts[1:]))
+
+        return result
+
+    def statistics(self, area: str, matrix_keys: list = None) -> AreaStatistics:
+
+        with closing(self.connect()) as conn:
+
+            table, row_count, dtypes = self._area(conn, area)
+
+            # GROUP BY ... ORDER BY MIN(rowid) keeps the first-seen order of unique() and groupby(sort=False)
+
+            matrix_keys = list(matrix_keys or [])
+
+            counts = [f"COUNT({quote(key)})" if key in dtypes else "0" for key in matrix_keys]
+
+            groups = conn.execute(f"SELECT feature_type, COUNT(*){''.join(f', {count}' for count in counts)} FROM {table} GROUP BY feature_type ORDER BY MIN(rowid)").fetchall()
+
+            features = [self.decode(group[0], dtypes.get('feature_type', 'object')) for group in groups]
+
+            attributes = [feature for feature in features if feature in dtypes]
+
+            stats = AreaStatistics(features, attributes, matrix_keys)
+
+            stats.row_count = row_count
+
+            if matrix_keys and groups:
+                stats.feature_counts = pd.DataFrame([group[1:] for group in groups], index=features, columns=['Row Count'] + matrix_keys, dtype='int64')
+
+            keys = [key for key in COMPLETENESS_KEYS if key in dtypes]
+
+            if keys:
+                stats.key_counts.update(zip(keys, conn.execute(f"SELECT {', '.join(f'COUNT({quote(key)})' for key in keys)} FROM {table}").fetchone()))
+
+            for start in range(0, len(attributes), ATTRIBUTE_QUERY_BATCH):
+
+                batch = attributes[start:start + ATTRIBUTE_QUERY_BATCH]
+
+                aggregates = []
+
+                for attribute in batch:
+                    aggregates.append(f"COUNT({quote(attribute)})")
+                    aggregates.extend(f"COUNT(CASE WHEN {quote(key)} IS NOT NULL THEN {quote(attribute)} END)" if key in dtypes else "0" for key in COMPLETENESS_KEYS)
+
+                counts = conn.execute(f"SELECT {', '.join(aggregates)} FROM {table}").fetchone()
+
+                width = 1 + len(COMPLETENESS_KEYS)
+
+                for i, attribute in enumerate(batch):
+                    stats.attr_counts.loc[attribute] = counts[i * width:(i + 1) * width]
+
+            if not attributes:
+                return stats
+
+            # Values are read back in the dtype of their column, then of the stacked attributes
+
+            stacked_dtype = pd.concat([dtype_proxy(dtypes[attribute], size=int(stats.attr_counts.loc[attribute, 'count'] > 0)) for attribute in attributes], ignore_index=True).dtype
+
+            labels = []
+            values = []
+            value_counts = []
+
+            for attribute in attributes:
+                for value, count in conn.execute(f"SELECT {quote(attribute)}, COUNT(*) FROM {table} WHERE {quote(attribute)} IS NOT NULL GROUP BY {quote(attribute)} ORDER BY MIN(rowid)"):
+                    labels.append(attribute)
+                    values.append(cast_value(self.decode(value, dtypes[attribute]), stacked_dtype))
+                    value_counts.append(count)
+
+        stats.attr_counts = stats.attr_counts.astype('int64')
+
+        if values:
+            stacked = pd.Series(values, dtype=stacked_dtype)
+            stats.value_counts = pd.Series(value_counts, dtype='int64').groupby([np.array(labels, dtype=object), stacked], sort=False).sum()
+
+        return stats
@@ -0,0 +1,179 @@
+import os
+import pandas as pd
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from .DataCache import AreaDataCache, DEFAULT_CACHE_MAX_BYTES
+from .DataTransformer import OSMCompletenessTransformer, CompletenessMatrixTransformer, AttributeReportTransformer, ValuesReportTransformer, ChartsReportSheetTransformer
+from .ChartCreator import ChartBuilder, ChartImageCache, render_chart
+from .RunManifest import RunManifest
+
+# Classes for processing areas in parallel worker processes
+
+def process_area(folder_path: str, area: str, chunksize: int = None, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES, loader_options: dict = None, backend: str = 'pandas', completeness_keys: list = None, chart_cache: bool = False, chart_cache_max_bytes: int = None, values_options: dict = None, backend_workers: int = None) -> dict:
+
+    # Runs in a worker process: loads one area once, builds its report frames and renders its charts.
+    # Workers share the chart cache directory; the parent trims it once every area is done
+
+    cache = AreaDataCache(folder_path, cache_max_bytes, loader_options, backend, completeness_keys, backend_workers)
+
+    # The area is loaded inside the transforms, so the transform time includes load_stats['seconds']
+
+    start = perf_counter()
+
+    completeness = OSMCompletenessTransformer(folder_path, [area], cache, chunksize).transform()
+    completeness_matrix = CompletenessMatrixTransformer(folder_path, [area], cache, chunksize, completeness_keys).transform()
+    attr_report = AttributeReportTransformer(folder_path, area, cache, chunksize).transform()
+    values_sheets = ValuesReportTransformer(folder_path, area, cache, chunksize, **(values_options or {})).sheets()
+    chart_report = ChartsReportSheetTransformer(folder_path, area, cache, chunksize).transform()
+
+    transform_seconds = perf_counter() - start
+
+    start = perf_counter()
+
+    file_path = fr"{folder_path}\reports\osm_category_charts.xlsx"
+
+    charts = ChartBuilder(file_path, folder_path, area, cache, chunksize).chart_values(list(chart_report['Category']))
+
+    images = ChartImageCache(folder_path, chart_cache_max_bytes) if chart_cache else None
+
+    chart_images = [render_chart(values_df, attribute) if images is None else images.render(values_df, attribute) for values_df, attribute in charts]
+
+    return {
+        'completeness': completeness,
+        'completeness_matrix': completeness_matrix,
+        'attr_report': attr_report,
+        'values_sheets': values_sheets,
+        'charts': chart_report,
+        'chart_images': chart_images,
+        'chart_cache': images.cache_info() if images is not None else {},
+        'load_stats': cache.load_stats.get(area, {}),
+        'timings': {'transform': transform_seconds, 'charts': perf_counter() - start},
+    }
+
+class ParallelAreaRunner:
+
+    """Fans per-area loading, transformation and chart rendering out to a process pool.
+
+    Each area is handled by process_area in its own worker; with workers=1 areas are
+    processed in this process instead. An area that fails is reported and left out of
+    the results; the remaining areas still complete. With a RunManifest, areas whose
+    inputs are unchanged are taken from their stored fragments and only the others are
+    recomputed. chart_cache_counts sums the chart cache hits and misses of the workers.
+
+    backend_workers sizes the process pool of a backend that has one (see
+    SharedMemoryBackend) when areas are processed in this process; area workers run
+    their backend in-process, so pools are never nested.
+    """
+
+    def __init__(self, folder_path: str, areas: list, workers: int = None, chunksize: int = None, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES, loader_options: dict = None, manifest: RunManifest = None, backend: str = 'pandas', completeness_keys: list = None, chart_cache: bool = False, chart_cache_max_bytes: int = None, values_options: dict = None, backend_workers: int = None):
+        self.folder_path = folder_path
+        self.areas = areas
+        self.workers = workers or os.cpu_count()
+        self.chunksize = chunksize
+        self.cache_max_bytes = cache_max_bytes
+        self.loader_options = loader_options
+        self.manifest = manifest
+        self.backend = backend
+        self.completeness_keys = completeness_keys
+        self.chart_cache = chart_cache
+        self.chart_cache_max_bytes = chart_cache_max_bytes
+        self.chart_cache_counts = {'hits': 0, 'misses': 0}
+        self.values_options = values_options
+        self.backend_workers = backend_workers
+        self.errors = {}
+        self.reused = []
+        self.area_stats = {}
+
+    def run(self) -> dict:
+
+        results = {}
+        pending = []
+
+        for area in self.areas:
+
+            if self.manifest is not None and self.manifest.is_current(area):
+                try:
+                    results[area] = self.manifest.load_fragment(area)
+                    self.reused.append(area)
+                    print(f"step: process_area, ✅ Inputs unchanged, reusing previous results for {area}.")
+                    continue
+                except Exception as e:
+                    print(f"step: process_area, ❌ Could not reuse previous results for {area}: {e}")
+
+            pending.append(area)
+
+        fingerprints = {area: self.manifest.fingerprint(area) for area in pending} if self.manifest is not None else {}
+
+        for area, result in self._process(pending):
+
+            results[area] = result
+
+            for counter in self.chart_cache_counts:
+                self.chart_cache_counts[counter] += result.get('chart_cache', {}).get(counter, 0)
+
+            if self.manifest is not None:
+                self.manifest.save_fragment(area, result, fingerprints[area])
+
+        if self.manifest is not None:
+            self.manifest.save()
+
+        for area, result in results.items():
+            self.area_stats[area] = {'load_stats': result.get('load_stats', {}), 'timings': result.get('timings', {}), 'reused': area in self.reused}
+
+        return {area: results[area] for area in self.areas if area in results}
+
+    def _process(self, areas: list):
+
+        args = (self.chunksize, self.cache_max_bytes, self.loader_options, self.backend, self.completeness_keys, self.chart_cache, self.chart_cache_max_bytes, self.values_options)
+
+        if self.workers == 1 or len(areas) <= 1:
+
+            for area in areas:
+                try:
+                    yield area, process_area(self.folder_path, area, *args, self.backend_workers)
+                except Exception as e:
+                    self.errors[area] = e
+                    print(f"step: process_area, ❌ Error processing {area}: {e}")
+
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(areas))) as executor:
+
+            futures = {area: executor.submit(process_area, self.folder_path, area, *args, 1) for area in areas}
+
+            for area, future in futures.items():
+                try:
+                    yield area, future.result()
+                except Exception as e:
+                    self.errors[area] = e
+                    print(f"step: process_area, ❌ Error processing {area}: {e}")
+
+    def run_transforms(self) -> tuple:
+
+        # Gathers worker results, in area order, into the dictionaries the Excel writers expect
+
+        results = self.run()
+
+        excel_dict = {}
+        excel_dict_charts = {}
+        chart_images = {}
+
+        completeness = [results[area]['completeness'] for area in self.areas if area in results]
+
+        excel_dict['completeness_overview'] = pd.concat(completeness, ignore_index=True) if completeness else pd.DataFrame()
+
+        matrices = [results[area]['completeness_matrix'] for area in self.areas if area in results]
+
+        excel_dict['completeness_matrix'] = pd.concat(matrices, ignore_index=True) if matrices else pd.DataFrame()
+
+        for area in self.areas:
+
+            if area not in results:
+                continue
+
+            excel_dict[f'{area}_attr_report'] = results[area]['attr_report']
+            excel_dict.update(results[area]['values_sheets'])
+            excel_dict_charts[f'{area}_charts'] = results[area]['charts']
+            chart_images[area] = results[area]['chart_images']
+
+        return excel_dict, excel_dict_charts, chart_images
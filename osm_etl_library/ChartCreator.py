@@ -1,8 +1,11 @@
+import os
+import hashlib
 import pandas as pd
-import matplotlib.pyplot as plt
+from io import BytesIO
+from concurrent.futures import Future, ProcessPoolExecutor
 from openpyxl import load_workbook
 from openpyxl.drawing.image import Image as XLImage
-from .DataLoader import CSVLoader
+from .DataCache import AreaDataCache, load_statistics
 
 # Classes for Chart Creation
 
@@ -12,86 +15,361 @@ def pixels_to_column_width(pixels):
 def pixels_to_row_height(pixels):
     return pixels * 0.75  # 1 pixel ≈ 0.75 point
 
+# Everything besides the data that decides how a chart looks; part of every chart cache key
+
+CHART_SETTINGS = {'figsize': (5, 3), 'color': 'skyblue', 'title': 'Top 10 Categories with "Other" for {attribute}', 'format': 'png'}
+
+DEFAULT_CHART_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+def render_chart(values_df: pd.DataFrame, attribute: str) -> bytes:
+
+    # Renders through the object-oriented Agg API into memory, so no pyplot global state
+    # is touched and charts can be drawn concurrently in worker processes. matplotlib is
+    # imported here so it is only loaded once charts are actually drawn
+
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=CHART_SETTINGS['figsize'])
+    FigureCanvasAgg(fig)
+
+    ax = fig.add_subplot()
+    ax.bar(values_df['Category'], values_df['Count'], color=CHART_SETTINGS['color'])
+    ax.set_title(CHART_SETTINGS['title'].format(attribute=attribute))
+    ax.set_xlabel('Category')
+    ax.set_ylabel('Count')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=CHART_SETTINGS['format'])
+
+    return buffer.getvalue()
+
+def chart_key(values_df: pd.DataFrame, attribute: str) -> str:
+
+    # Categories keep their type, as matplotlib places numeric categories differently from text
+
+    from matplotlib import __version__ as matplotlib_version
+
+    digest = hashlib.sha256()
+
+    digest.update(repr((sorted(CHART_SETTINGS.items()), matplotlib_version, str(attribute))).encode())
+
+    for category, count in zip(values_df['Category'].tolist(), values_df['Count'].tolist()):
+        digest.update(repr((type(category).__name__, str(category), int(count))).encode())
+
+    return digest.hexdigest()
+
+class ChartImageCache:
+
+    """Content-addressed store of rendered chart PNGs under chart_cache/.
+
+    A chart's key is a hash of its plotted categories and counts, its title and
+    CHART_SETTINGS, so an attribute whose top-10 + "Other" distribution is unchanged
+    since an earlier run is taken from disk instead of being drawn again. Each image is
+    its own file, written atomically, so worker processes can share the directory; the
+    file mtime is the last use, and evict() removes least-recently-used images until
+    the cache fits in max_bytes (DEFAULT_CHART_CACHE_MAX_BYTES when None). hits and
+    misses are counted per instance and reported by cache_info().
+    """
+
+    def __init__(self, folder_path: str, max_bytes: int = None):
+        self.folder_path = folder_path
+        self.cache_path = fr"{folder_path}\chart_cache"
+        self.max_bytes = DEFAULT_CHART_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def image_path(self, key: str) -> str:
+        return fr"{self.cache_path}\{key}.png"
+
+    def get(self, key: str) -> bytes:
+
+        try:
+            with open(self.image_path(key), 'rb') as f:
+                image = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        os.utime(self.image_path(key))
+
+        self.hits += 1
+
+        return image
+
+    def put(self, key: str, image: bytes):
+
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            with open(f"{self.image_path(key)}.{os.getpid()}.tmp", 'wb') as f:
+                f.write(image)
+            os.replace(f"{self.image_path(key)}.{os.getpid()}.tmp", self.image_path(key))
+        except OSError as e:
+            print(f"Could not write chart cache entry {key}: {e}")
+
+    def render(self, values_df: pd.DataFrame, attribute: str) -> bytes:
+
+        key = chart_key(values_df, attribute)
+
+        image = self.get(key)
+
+        if image is None:
+            image = render_chart(values_df, attribute)
+            self.put(key, image)
+
+        return image
+
+    def evict(self):
+
+        if not os.path.isdir(self.cache_path):
+            return
+
+        entries = []
+
+        for entry in os.scandir(self.cache_path):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+            self.evictions += 1
+
+    def add_counts(self, info: dict):
+
+        # Counts of a ChartImageCache used in a worker process
+
+        self.hits += info.get('hits', 0)
+        self.misses += info.get('misses', 0)
+
+    def cache_info(self) -> dict:
+
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'max_bytes': self.max_bytes,
+        }
+
 class ChartBuilder:
 
-    def __init__(self, file_path: str, folder_path: str, area: str):
+    def __init__(self, file_path: str, folder_path: str, area: str, cache: AreaDataCache = None, chunksize: int = None, save_png: bool = True, chart_cache: ChartImageCache = None):
         self.file_path = file_path
         self.folder_path = folder_path
         self.area = area
+        self.cache = cache
+        self.chunksize = chunksize
+        self.save_png = save_png
+        self.chart_cache = chart_cache
 
-    def create_charts(self):
+    def value_counts(self, stats, attribute: str) -> pd.DataFrame:
 
-        wb = load_workbook(self.file_path)
+        counts = stats.sorted_value_counts(attribute)
+
+        return counts.rename_axis('Category').reset_index(name='Count')
+
+    def attributes(self, wb) -> list:
 
         ws = wb[f"{self.area}_charts"]
-    
+
         column_values = [cell.value for cell in ws['A']]
-        
-        attributes = column_values[1:]
 
-        df = CSVLoader(self.folder_path, self.area).load_dataframes()
+        return column_values[1:]
+
+    def chart_values(self, attributes: list) -> list:
+
+        stats = load_statistics(self.folder_path, self.area, self.chunksize, self.cache)
+
+        charts = []
+
+        for attribute in attributes:
+            attr_value = self.value_counts(stats, attribute)
+
+            if len(attr_value) > 10:
+                top_10 = attr_value.head(10)
+                # The attribute's count also covers values an approximate run did not keep
+                other_sum = int(stats.attr_counts.loc[attribute, 'count']) - int(top_10['Count'].sum())
+                other_row = pd.DataFrame([{'Category': 'Other', 'Count': other_sum}])
+                values_df = pd.concat([top_10, other_row], ignore_index=True)
+
+            else:
+                values_df = attr_value
+
+            charts.append((values_df, attribute))
+
+        return charts
+
+    def render_charts(self, attributes: list) -> list:
+
+        render = render_chart if self.chart_cache is None else self.chart_cache.render
+
+        images = [render(values_df, attribute) for values_df, attribute in self.chart_values(attributes)]
+
+        self.save_charts(images)
+
+        return images
+
+    def save_charts(self, images: list):
+
+        # PNG copies in charts/{area} are optional; the workbook is filled from memory
+
+        if not self.save_png:
+            return
+
+        for i in range(len(images)):
+            with open(fr"{self.folder_path}\charts\{self.area}\bar_chart_{i}.png", 'wb') as f:
+                f.write(images[i])
+
+    def insert_charts(self, wb, images: list):
+
+        ws = wb[f"{self.area}_charts"]
+
+        for i in range(len(images)):
+
+            img = XLImage(BytesIO(images[i]))
+
+            img.width = 140*3
+            img.height = 100*3
+
+            img.anchor = f'B{2 + i}'  # Add space between images
+
+            # Resize column C
+            ws.column_dimensions['B'].width = pixels_to_column_width(img.width)
+
+            # Resize row 2
+            ws.row_dimensions[2 + i].height = pixels_to_row_height(img.height)
+
+            ws.add_image(img)
+
+    def create_charts(self, images: list = None):
+
+        # images lets charts already rendered elsewhere (e.g. by a worker process) be inserted as-is
+
+        wb = load_workbook(self.file_path)
 
         try:
-            for i in range(len(attributes)):
-                attribute = attributes[i]
-                attr = df[df[attribute].isnull() == False]
-                attr_value = attr[attribute].value_counts().rename_axis('Category').reset_index(name='Count')
-
-                if len(attr_value) > 10:
-                    top_10 = attr_value.head(10)
-                    other_sum = int(attr_value.iloc[10:]['Count'].sum())
-                    other_row = pd.DataFrame([{'Category': 'Other', 'Count': other_sum}])
-                    values_df = pd.concat([top_10, other_row], ignore_index=True)
-                    
-                else:
-                    values_df = attr_value
-
-                # Create bar plot
-                plt.figure(figsize=(5, 3))
-                plt.bar(values_df['Category'], values_df['Count'], color='skyblue')
-                plt.title(f'Top 10 Categories with "Other" for {attribute}')
-                plt.xlabel('Category')
-                plt.ylabel('Count')
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                chart_path = fr"{self.folder_path}\charts\{self.area}\bar_chart_{i}.png"
-                plt.savefig(chart_path)
-                plt.close()
-            
-                img = XLImage(fr"{self.folder_path}\charts\{self.area}\bar_chart_{i}.png")
-            
-                img.width = 140*3  
-                img.height = 100*3
-            
-                img.anchor = f'B{2 + i}'  # Add space between images
-            
-                # Resize column C
-                ws.column_dimensions['B'].width = pixels_to_column_width(img.width)
-            
-                # Resize row 2
-                ws.row_dimensions[2 + i].height = pixels_to_row_height(img.height)
-            
-                ws.add_image(img)
-            
-            wb.save(fr"{self.folder_path}\reports\osm_category_charts.xlsx")                 
+            if images is None:
+                images = self.render_charts(self.attributes(wb))
+
+            self.insert_charts(wb, images)
+
+            wb.save(fr"{self.folder_path}\reports\osm_category_charts.xlsx")
             print(f"step: add_graphs_to_plot_sheet, ✅ Excel file updated successfully for {self.area}.")
-        
+
         except Exception as e:
             print(f"step: add_graphs_to_plot_sheet, ❌ Error updating Excel file '{self.file_path}': {e}")
-        
+
 class ChartBuilderPipeline:
 
-    def __init__(self, folder_path, areas: list):
+    """Adds every area's charts to osm_category_charts.xlsx in one open/save session.
+
+    With workers set, the charts of all areas and attributes are submitted to a process
+    pool together and rendered concurrently before being inserted. chart_images maps an
+    area to charts that were already rendered elsewhere. With chart_cache set, charts
+    whose distribution was rendered before are read from it and only the misses are
+    drawn; the cache is trimmed to its size cap once the workbook is saved.
+    """
+
+    def __init__(self, folder_path, areas: list, cache: AreaDataCache = None, chunksize: int = None, chart_images: dict = None, workers: int = None, save_png: bool = True, chart_cache: ChartImageCache = None):
         self.folder_path = folder_path
         self.areas = areas
-        
+        self.cache = cache
+        self.chunksize = chunksize
+        self.chart_images = chart_images or {}
+        self.workers = workers
+        self.save_png = save_png
+        self.chart_cache = chart_cache
+
+    def render(self, executor, values_df: pd.DataFrame, attribute: str):
+
+        if self.chart_cache is None:
+            key = image = None
+        else:
+            key = chart_key(values_df, attribute)
+            image = self.chart_cache.get(key)
+
+        if image is not None:
+            return image
+
+        if executor is None:
+            image = render_chart(values_df, attribute)
+        else:
+            image = executor.submit(render_chart, values_df, attribute)
+
+        # Keys go with the rendered images so misses are stored once their future resolves
+
+        return (key, image) if self.chart_cache is not None else image
+
+    def resolve(self, image) -> bytes:
+
+        if isinstance(image, tuple):
+            key, image = image
+            image = image.result() if isinstance(image, Future) else image
+            self.chart_cache.put(key, image)
+
+        return image.result() if isinstance(image, Future) else image
+
     def run_transforms(self) -> dict:
 
         file_path = fr"{self.folder_path}\reports\osm_category_charts.xlsx"
 
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+
         try:
+            wb = load_workbook(file_path)
+
+            pending = {}
+
             for area in self.areas:
-                ChartBuilder(file_path, self.folder_path, area).create_charts()
+
+                builder = ChartBuilder(file_path, self.folder_path, area, self.cache, self.chunksize, self.save_png, self.chart_cache)
+
+                if area in self.chart_images:
+                    pending[area] = (builder, self.chart_images[area])
+                    continue
+
+                try:
+                    charts = builder.chart_values(builder.attributes(wb))
+                except Exception as e:
+                    print(f"step: add_graphs_to_plot_sheet, ❌ Error preparing charts for {area}: {e}")
+                    continue
+
+                pending[area] = (builder, [self.render(executor, values_df, attribute) for values_df, attribute in charts])
+
+            for area, (builder, images) in pending.items():
+                try:
+                    images = [self.resolve(image) for image in images]
+                    builder.save_charts(images)
+                    builder.insert_charts(wb, images)
+                    print(f"step: add_graphs_to_plot_sheet, ✅ Charts added for {area}.")
+                except Exception as e:
+                    print(f"step: add_graphs_to_plot_sheet, ❌ Error adding charts for {area}: {e}")
+
+            wb.save(file_path)
+
+            if self.chart_cache is not None:
+                self.chart_cache.evict()
+
             return f"step: run_transforms, ✅ Charts created successfully for {len(self.areas)} areas."
         except Exception as e:
             return f"step: run_transforms, ❌ Error creating charts: {e}"
+        finally:
+            if executor is not None:
+                executor.shutdown()
@@ -0,0 +1,463 @@
+import os
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .DataAggregator import AreaStatistics, ApproximateAreaStatistics, COMPLETENESS_KEYS, feature_key_counts
+from .DataLoader import CSVLoader, make_loader
+from .PandasDtypes import pandas_dtype, dtype_proxy, cast_value
+from .TagStore import TagStore
+
+# Classes for computing area statistics on different engines
+
+APPROXIMATE_CHUNKSIZE = 200_000
+
+# The strings read_csv treats as missing by default (its na_values documentation), so Arrow
+# reads the same cells as null
+
+CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+
+class ComputeBackend(ABC):
+
+    # uses_frames tells the transformers whether the area frame exists for their dense
+    # pandas path or whether everything has to come from AreaStatistics
+
+    uses_frames = True
+
+    @abstractmethod
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+        pass
+
+    def close(self):
+
+        # Releases whatever the backend holds for the run; called by AreaDataCache.clear()
+
+        pass
+
+class PandasBackend(ComputeBackend):
+
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+
+        if chunksize is None:
+            data = cache.get(area)
+            return AreaStatistics.from_tag_store(data) if isinstance(data, TagStore) else AreaStatistics.from_frame(data)
+
+        cache.misses += 1
+
+        start = perf_counter()
+
+        loader = make_loader(cache.folder_path, area, **cache.loader_options)
+        stats = AreaStatistics.from_chunks(loader, chunksize, matrix_keys=cache.matrix_keys)
+
+        cache.record_load(area, loader, perf_counter() - start)
+
+        return stats
+
+class ArrowBackend(ComputeBackend):
+
+    """Computes area statistics with pyarrow instead of a pandas frame.
+
+    Tables are read by Arrow's multi-threaded CSV reader, and the per-attribute
+    not-null counts, key co-occurrence and hash-based value counts run as Arrow compute
+    kernels, which release the GIL; value counts of different columns run on a thread
+    pool of threads workers. Only the unique values reach pandas, where the final
+    grouping reproduces read_csv's and concat's dtype rules, so the reports are
+    identical to the pandas backend's.
+
+    The area frame is never built, and chunksize is ignored because Arrow's columnar
+    tables are already a fraction of the pandas frame. Only the FME CSV source is
+    supported; other sources fall back to PandasBackend.
+    """
+
+    uses_frames = False
+
+    def __init__(self, threads: int = None):
+        self.threads = threads
+
+    def read_table(self, csv_path: str):
+
+        import pyarrow as pa
+        from pyarrow import csv
+        # pandas' missing-value markers; Arrow infers dates and times that pandas keeps as text
+
+        convert_options = csv.ConvertOptions(null_values=CSV_NA_VALUES, strings_can_be_null=True, true_values=['True', 'TRUE', 'true'], false_values=['False', 'FALSE', 'false'])
+
+        table = csv.read_csv(csv_path, read_options=csv.ReadOptions(use_threads=True), convert_options=convert_options)
+
+        temporal = [field.name for field in table.schema if pa.types.is_temporal(field.type)]
+
+        if temporal:
+            convert_options.column_types = {name: pa.string() for name in temporal}
+            table = csv.read_csv(csv_path, read_options=csv.ReadOptions(use_threads=True), convert_options=convert_options)
+
+        return table
+
+    @staticmethod
+    def value_counts(column) -> tuple:
+
+        import pyarrow.compute as pc
+
+        counts = pc.value_counts(column)
+        valid = counts.field('values').is_valid()
+
+        return counts.field('values').filter(valid).to_pylist(), counts.field('counts').filter(valid).to_pylist()
+
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+
+        if cache.loader_options.get('source', 'csv') != 'csv':
+            print(f"The Arrow backend only reads the FME CSV tables, computing {area} with pandas.")
+            return PandasBackend().statistics(cache, area, chunksize)
+
+        cache.misses += 1
+
+        start = perf_counter()
+
+        loader = CSVLoader(cache.folder_path, area)
+
+        tables = []
+
+        for table in loader.tables():
+
+            csv_path = fr"{cache.folder_path}\tables\{table}.csv"
+
+            try:
+                data = self.read_table(csv_path)
+            except FileNotFoundError:
+                print(f"File {table}.csv not found in {cache.folder_path}. Skipping this table.")
+                continue
+
+            loader.table_stats[table] = {'rows': data.num_rows, 'bytes': os.path.getsize(csv_path)}
+
+            # CSVLoader's concat never keeps the columns of an empty table
+
+            if data.num_rows:
+                tables.append(data)
+
+        stats = self.table_statistics(tables, cache.matrix_keys)
+
+        cache.record_load(area, loader, perf_counter() - start)
+
+        return stats
+
+    @staticmethod
+    def feature_counts(tables: list, matrix_keys: list) -> pd.DataFrame:
+
+        # feature_key_counts over feature_type and the keys' validity, one table at a time
+
+        counts = []
+
+        for data in tables:
+
+            keys = {key: np.where(data.column(key).is_valid().to_numpy(zero_copy_only=False), 1.0, np.nan) for key in matrix_keys if key in data.column_names}
+
+            counts.append(feature_key_counts(pd.DataFrame({'feature_type': data.column('feature_type').to_pandas(), **keys}), matrix_keys))
+
+        return pd.concat(counts).groupby(level=0, sort=False, dropna=False).sum()
+
+    def table_statistics(self, tables: list, matrix_keys: list = None) -> AreaStatistics:
+
+        import pyarrow.compute as pc
+
+        if not tables:
+            return AreaStatistics(matrix_keys=matrix_keys)
+
+        # Area column dtypes, resolved by pandas from one-row stand-ins of every table
+
+        proxies = [pd.DataFrame({name: dtype_proxy(*pandas_dtype(data.column(name))) for name in data.column_names}) for data in tables]
+
+        area_dtypes = pd.concat(proxies, ignore_index=True).dtypes.to_dict()
+        area_dtypes['unknown'] = np.dtype(object)
+
+        features = [feature for data in tables for feature in pc.unique(data.column('feature_type')).to_pylist()]
+        features = list(pd.unique(pd.Series([np.nan if feature is None else feature for feature in features], dtype=object)))
+
+        attributes = [feature for feature in features if feature in area_dtypes]
+
+        stats = AreaStatistics(features, attributes, matrix_keys)
+
+        stats.row_count = sum(data.num_rows for data in tables)
+
+        if stats.matrix_keys:
+            stats.feature_counts = self.feature_counts(tables, stats.matrix_keys)
+
+        data_valid = [{name: pc.is_valid(data.column(name)) for name in data.column_names if name in attributes or name in COMPLETENESS_KEYS} for data in tables]
+
+        # The unknown column CSVLoader derives is present exactly where feature_type is "unknown"
+
+        unknown = [pc.fill_null(pc.equal(data.column('feature_type'), 'unknown'), False) for data in tables]
+
+        def present(i, name):
+            if name == 'unknown':
+                return unknown[i]
+            return data_valid[i].get(name)
+
+        for key in COMPLETENESS_KEYS:
+            stats.key_counts[key] = sum(int(pc.sum(valid[key]).as_py() or 0) for valid in data_valid if key in valid)
+
+        counts = pd.DataFrame(0, index=pd.Index(attributes, dtype=object), columns=stats.attr_counts.columns, dtype='int64')
+
+        for i in range(len(tables)):
+            for attribute in attributes:
+                mask = present(i, attribute)
+                if mask is None:
+                    continue
+                counts.loc[attribute, 'count'] += int(pc.sum(mask).as_py() or 0)
+                for key in COMPLETENESS_KEYS:
+                    if key in data_valid[i]:
+                        counts.loc[attribute, key] += int(pc.sum(pc.and_(mask, data_valid[i][key])).as_py() or 0)
+
+        stats.attr_counts = counts.reindex(attributes).astype('int64')
+
+        if not attributes:
+            return stats
+
+        # Hash value counts per (attribute, table) on a thread pool; the kernels release the GIL
+
+        jobs = [(attribute, i) for attribute in attributes for i in range(len(tables)) if attribute != 'unknown' and attribute in tables[i].column_names]
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            results = dict(zip(jobs, executor.map(lambda job: self.value_counts(tables[job[1]].column(job[0])), jobs)))
+
+        for i, mask in enumerate(unknown):
+            n = int(pc.sum(mask).as_py() or 0)
+            results[('unknown', i)] = (['unknown'], [n]) if n else ([], [])
+
+        # The stacked dtype pandas would give the non-null values of all attributes
+
+        stacked_dtype = pd.concat([dtype_proxy(area_dtypes[attribute], size=int(counts.loc[attribute, 'count'] > 0)) for attribute in attributes], ignore_index=True).dtype
+
+        labels = []
+        values = []
+        value_counts = []
+
+        for attribute in attributes:
+            for i in range(len(tables)):
+                if (attribute, i) not in results:
+                    continue
+                table_values, table_counts = results[(attribute, i)]
+                table_dtype = pandas_dtype(tables[i].column(attribute))[0] if attribute != 'unknown' else 'object'
+                labels.extend([attribute] * len(table_values))
+                values.extend(cast_value(cast_value(cast_value(value, table_dtype), area_dtypes[attribute]), stacked_dtype) for value in table_values)
+                value_counts.extend(table_counts)
+
+        if values:
+            labels = np.array(labels, dtype=object)
+            stacked = pd.Series(values, dtype=stacked_dtype)
+            stats.value_counts = pd.Series(value_counts, dtype='int64').groupby([labels, stacked], sort=False).sum()
+
+        return stats
+
+class ApproximateBackend(ComputeBackend):
+
+    """Streams areas into ApproximateAreaStatistics, in fixed memory.
+
+    Areas are read in chunks of chunksize rows (APPROXIMATE_CHUNKSIZE when the run has
+    none); each chunk's value counts are folded into per-attribute HyperLogLog and
+    heavy-hitter sketches and then dropped. Counts and completeness are exact; unique
+    values, modes and value frequencies carry the error bounds documented on
+    ApproximateAreaStatistics.
+    """
+
+    uses_frames = False
+
+    def __init__(self, capacity: int = 1000, precision: int = 14):
+        self.capacity = capacity
+        self.precision = precision
+
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+
+        cache.misses += 1
+
+        start = perf_counter()
+
+        options = dict(cache.loader_options, representation='dense')
+
+        loader = make_loader(cache.folder_path, area, **options)
+        stats = ApproximateAreaStatistics.from_chunks(loader, chunksize or APPROXIMATE_CHUNKSIZE, capacity=self.capacity, precision=self.precision, matrix_keys=cache.matrix_keys)
+
+        cache.record_load(area, loader, perf_counter() - start)
+
+        return stats
+
+def _attribute_counts(handle: dict, attributes: list) -> tuple:
+
+    # Runs in a worker process on the shared area frame: attribute and key co-occurrence
+    # counts, and each attribute's value counts in the dtype of its own column
+
+    from .SharedFrames import attach_frame
+
+    df = attach_frame(handle, attributes + COMPLETENESS_KEYS)
+
+    key_notnull = {key: df[key].notna().to_numpy() for key in COMPLETENESS_KEYS if key in df.columns}
+
+    counts = {}
+    value_counts = {}
+
+    for attribute in attributes:
+
+        notnull = df[attribute].notna().to_numpy()
+
+        counts[attribute] = [int(np.count_nonzero(notnull))] + [int(np.count_nonzero(notnull & key_notnull[key])) if key in key_notnull else 0 for key in COMPLETENESS_KEYS]
+
+        values = df[attribute].dropna()
+
+        value_counts[attribute] = values.groupby(values, sort=False).size()
+
+    return counts, value_counts
+
+class SharedMemoryBackend(ComputeBackend):
+
+    """Splits an area's attribute statistics across worker processes sharing one frame.
+
+    The area frame is loaded once through the cache and published to a SharedFrameStore;
+    workers attach to the memory-mapped copy, reading only their attributes and the
+    completeness keys, so no frame is pickled and resident memory does not grow with
+    the number of workers. Attributes are spread over workers by their non-null counts,
+    and the counts that come back are stacked as AreaStatistics.update() would stack
+    them, so the reports match the pandas backend. The published frames are removed
+    when the cache is cleared at the end of the run.
+
+    workers sizes the pool (os.cpu_count() when None); with one worker or fewer the
+    area is computed in this process, which ParallelAreaRunner relies on so its area
+    workers do not each start a pool of their own. The other report transformers and
+    the charts read the AreaStatistics built here rather than the published frame.
+    Streamed runs (chunksize) and sparse areas are computed by PandasBackend.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.store = None
+        self.executor = None
+
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+
+        if chunksize is not None or cache.loader_options.get('representation', 'dense') != 'dense':
+            return PandasBackend().statistics(cache, area, chunksize)
+
+        df = cache.get(area)
+
+        features = list(df['feature_type'].unique())
+        attributes = [feature for feature in features if feature in df.columns]
+
+        if self.workers <= 1 or len(attributes) < 2:
+            return AreaStatistics.from_frame(df)
+
+        from .SharedFrames import SharedFrameStore
+
+        if self.store is None:
+            self.store = SharedFrameStore()
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        handle = self.store.publish(area, df)
+
+        # Greedy split by non-null count, largest attributes first, keeping area order within a group
+
+        sizes = df[attributes].count()
+        groups = [[] for _ in range(min(self.workers, len(attributes)))]
+        loads = [0] * len(groups)
+
+        for attribute in sorted(attributes, key=lambda attribute: -sizes[attribute]):
+            i = loads.index(min(loads))
+            groups[i].append(attribute)
+            loads[i] += int(sizes[attribute])
+
+        results = list(self.executor.map(_attribute_counts, [handle] * len(groups), [sorted(group, key=attributes.index) for group in groups]))
+
+        counts = {}
+        value_counts = {}
+
+        for group_counts, group_values in results:
+            counts.update(group_counts)
+            value_counts.update(group_values)
+
+        stats = AreaStatistics(features, attributes)
+
+        stats.row_count = len(df)
+
+        for key in COMPLETENESS_KEYS:
+            if key in df.columns:
+                stats.key_counts[key] = int(df[key].notna().sum())
+
+        stats.attr_counts = pd.DataFrame([counts[attribute] for attribute in attributes], index=pd.Index(attributes, dtype=object), columns=stats.attr_counts.columns, dtype='int64')
+
+        # Cast every value to the dtype the stacked values of all attributes would have
+
+        stacked_dtype = pd.concat([dtype_proxy(df[attribute].dtype, size=int(counts[attribute][0] > 0)) for attribute in attributes], ignore_index=True).dtype
+
+        labels = []
+        values = []
+        totals = []
+
+        for attribute in attributes:
+            labels.extend([attribute] * len(value_counts[attribute]))
+            values.extend(cast_value(value, stacked_dtype) for value in value_counts[attribute].index)
+            totals.extend(value_counts[attribute].tolist())
+
+        if values:
+            stats.value_counts = pd.Series(totals, dtype='int64').groupby([np.array(labels, dtype=object), pd.Series(values, dtype=stacked_dtype)], sort=False).sum()
+
+        return stats
+
+    def close(self):
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+class SQLiteBackend(ComputeBackend):
+
+    """Computes area statistics as SQL aggregates over a local AreaIndex.
+
+    An area is ingested into the SQLite index on its first use and again only when its
+    source files change; after that every report is a handful of indexed queries, with
+    no tables reparsed. chunksize is ignored. database_path defaults to
+    index\\osm_areas.sqlite under the run folder.
+    """
+
+    uses_frames = False
+
+    def __init__(self, database_path: str = None):
+        self.database_path = database_path
+
+    def statistics(self, cache, area: str, chunksize: int = None) -> AreaStatistics:
+
+        from .AreaIndex import AreaIndex
+
+        cache.misses += 1
+
+        start = perf_counter()
+
+        index = AreaIndex(cache.folder_path, self.database_path, cache.loader_options)
+
+        loader = index.ensure(area)
+        stats = index.statistics(area, cache.matrix_keys)
+
+        cache.record_load(area, loader, perf_counter() - start)
+
+        return stats
+
+BACKENDS = {'pandas': PandasBackend, 'arrow': ArrowBackend, 'sqlite': SQLiteBackend, 'approximate': ApproximateBackend, 'shared': SharedMemoryBackend}
+
+def make_backend(backend = None, workers: int = None) -> ComputeBackend:
+
+    # backend is a name from BACKENDS, a ComputeBackend instance or None for pandas;
+    # workers sizes the process pool of the backends that have one
+
+    if backend is None:
+        return PandasBackend()
+
+    if isinstance(backend, ComputeBackend):
+        return backend
+
+    if backend == 'shared':
+        return SharedMemoryBackend(workers)
+
+    return BACKENDS[backend]()
@@ -0,0 +1,423 @@
+import numpy as np
+import pandas as pd
+from .Sketches import HyperLogLog, heavy_hitters
+
+# Classes for incremental aggregation of report statistics
+
+COMPLETENESS_KEYS = ['name', 'name:en', 'addr:street']
+
+COMPLETENESS_MATRIX_KEYS = COMPLETENESS_KEYS + ['addr:housenumber', 'addr:postcode', 'opening_hours', 'website', 'phone']
+
+ATTRIBUTE_REPORT_COLUMNS = [
+    'Attribute', 'Count', 'Name Count', 'Name Completeness', 'Name Count (eng)', 'Name Completeness (eng)',
+    'Address Count (Street)', 'Address Completeness (Street)', 'Unique Values', 'Mode', 'Freq. of Mode'
+]
+
+VALUES_REPORT_DTYPES = {'attr_name': 'str', 'attr_values': 'str', 'counts': 'int', 'freq (excl NaN)': 'float'}
+
+def feature_key_counts(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+
+    # Row count and not-null count of every key per feature_type, in first-seen feature
+    # order, from one groupby over the not-null matrix of all keys
+
+    present = [key for key in keys if key in df.columns]
+
+    groups = df[present].notna().groupby(df['feature_type'].to_numpy(), sort=False, dropna=False)
+
+    counts = groups.sum().reindex(columns=keys, fill_value=0).astype('int64')
+    counts.insert(0, 'Row Count', groups.size().astype('int64'))
+
+    return counts
+
+class AreaStatistics:
+
+    """Mergeable statistics behind the completeness, attribute and values reports.
+
+    All attributes are processed together: one not-null matrix gives the per-attribute
+    and per-key counts, and the non-null values of every attribute are stacked into a
+    single long series whose (attribute, value) group sizes are the value counts. The
+    attribute and values reports and the chart data are all built from these shared
+    results, each report in one go.
+
+    Statistics can be accumulated chunk by chunk with update() and combined with
+    merge(), so an area never has to be held in memory as a single frame. Value counts
+    keep first-seen order and are sorted stably by count at the end, which reproduces
+    pandas' value_counts() ordering. With matrix_keys, every update() also adds the
+    chunk's feature_key_counts to feature_counts, so the completeness matrix of a
+    streamed area comes out of the same pass.
+    """
+
+    def __init__(self, features: list = None, attributes: list = None, matrix_keys: list = None):
+        self.row_count = 0
+        self.key_counts = {key: 0 for key in COMPLETENESS_KEYS}
+        self.features = list(features or [])
+        self.attributes = list(attributes or [])
+        self.attr_counts = pd.DataFrame(0, index=pd.Index(self.attributes, dtype=object), columns=['count'] + COMPLETENESS_KEYS, dtype='int64')
+        self.value_counts = pd.Series(dtype='int64')
+        self.matrix_keys = list(matrix_keys or [])
+        self.feature_counts = feature_key_counts(pd.DataFrame({'feature_type': pd.Series(dtype=object)}), self.matrix_keys)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'AreaStatistics':
+
+        features = list(df['feature_type'].unique())
+
+        attributes = [feature for feature in features if feature in df.columns]
+
+        stats = cls(features, attributes)
+        stats.update(df)
+
+        return stats
+
+    @classmethod
+    def from_tag_store(cls, store) -> 'AreaStatistics':
+
+        # Works on the non-empty cells only: every count is a length or bincount over a
+        # key's block of triples, and row membership of the completeness keys is a mask
+
+        features = list(store.features)
+
+        attributes = [feature for feature in features if feature in store.keys]
+
+        stats = cls(features, attributes)
+
+        stats.row_count = store.row_count
+
+        key_present = {}
+
+        for key in COMPLETENESS_KEYS:
+            stats.key_counts[key] = store.count(key)
+            key_present[key] = store.has_key(key)
+
+        value_counts = []
+
+        for attribute in attributes:
+
+            rows = store.key_rows(attribute)
+
+            stats.attr_counts.loc[attribute, 'count'] = len(rows)
+
+            for key in COMPLETENESS_KEYS:
+                stats.attr_counts.loc[attribute, key] = int(np.count_nonzero(key_present[key][rows]))
+
+            counts = store.value_counts(attribute)
+
+            if not counts.empty:
+                value_counts.append(pd.concat({attribute: counts}))
+
+        if value_counts:
+            stats.value_counts = pd.concat(value_counts)
+
+        return stats
+
+    @classmethod
+    def from_chunks(cls, loader, chunksize: int, **options) -> 'AreaStatistics':
+
+        # First pass reads only feature_type to find which columns are attributes
+
+        features = []
+
+        for chunk in loader.iter_chunks(chunksize, columns=['feature_type']):
+            features.extend(chunk['feature_type'].unique())
+
+        features = list(pd.unique(pd.Series(features, dtype=object)))
+
+        columns = loader.table_columns() | {'unknown'}
+
+        attributes = [feature for feature in features if feature in columns]
+
+        stats = cls(features, attributes, **options)
+
+        for chunk in loader.iter_chunks(chunksize, columns=list(dict.fromkeys(['feature_type'] + COMPLETENESS_KEYS + attributes + stats.matrix_keys))):
+            stats.update(chunk)
+
+        return stats
+
+    def update(self, df: pd.DataFrame):
+
+        self.row_count += len(df)
+
+        if self.matrix_keys:
+            self._add_feature_counts(feature_key_counts(df, self.matrix_keys))
+
+        keys = [key for key in COMPLETENESS_KEYS if key in df.columns]
+        key_notnull = df[keys].notna().to_numpy()
+
+        for i, key in enumerate(keys):
+            self.key_counts[key] += int(np.count_nonzero(key_notnull[:, i]))
+
+        attributes = [attribute for attribute in self.attributes if attribute in df.columns]
+
+        if not attributes:
+            return
+
+        notnull = df[attributes].notna().to_numpy()
+
+        counts = pd.DataFrame(0, index=pd.Index(attributes, dtype=object), columns=self.attr_counts.columns, dtype='int64')
+        counts['count'] = np.count_nonzero(notnull, axis=0)
+
+        for i, key in enumerate(keys):
+            counts[key] = np.count_nonzero(notnull & key_notnull[:, [i]], axis=0)
+
+        self.attr_counts = self.attr_counts.add(counts, fill_value=0).reindex(self.attributes).astype('int64')
+
+        # Stack the non-null values of every attribute into one long series
+
+        values = [df[attribute].dropna() for attribute in attributes]
+        labels = np.repeat(np.array(attributes, dtype=object), [len(column) for column in values])
+
+        stacked = pd.concat(values, ignore_index=True)
+
+        self._add_value_counts(stacked.groupby([labels, stacked], sort=False).size())
+
+    def _add_feature_counts(self, counts: pd.DataFrame):
+
+        if counts.empty:
+            return
+
+        if self.feature_counts.empty:
+            self.feature_counts = counts.astype('int64')
+        else:
+            self.feature_counts = pd.concat([self.feature_counts, counts]).fillna(0).groupby(level=0, sort=False, dropna=False).sum().astype('int64')
+
+    def _add_value_counts(self, counts: pd.Series):
+
+        if self.value_counts.empty:
+            self.value_counts = counts.astype('int64')
+        elif not counts.empty:
+            self.value_counts = pd.concat([self.value_counts, counts]).groupby(level=[0, 1], sort=False).sum()
+
+    def merge(self, other: 'AreaStatistics') -> 'AreaStatistics':
+
+        self.row_count += other.row_count
+
+        for key in COMPLETENESS_KEYS:
+            self.key_counts[key] += other.key_counts[key]
+
+        for feature in other.features:
+            if feature not in self.features:
+                self.features.append(feature)
+
+        for attribute in other.attributes:
+            if attribute not in self.attributes:
+                self.attributes.append(attribute)
+
+        self.attr_counts = self.attr_counts.add(other.attr_counts, fill_value=0).reindex(self.attributes).astype('int64')
+
+        self.matrix_keys.extend(key for key in other.matrix_keys if key not in self.matrix_keys)
+        self._add_feature_counts(other.feature_counts)
+
+        self._add_value_counts(other.value_counts)
+
+        return self
+
+    def subtract(self, other: 'AreaStatistics') -> 'AreaStatistics':
+
+        # Inverse of merge for rows that left the area; values whose count drops to zero go away
+
+        if isinstance(other, ApproximateAreaStatistics):
+            raise TypeError("AreaStatistics.subtract() needs exact statistics; ApproximateAreaStatistics cannot be subtracted")
+
+        self.row_count -= other.row_count
+
+        for key in COMPLETENESS_KEYS:
+            self.key_counts[key] -= other.key_counts[key]
+
+        for attribute in other.attributes:
+            if attribute not in self.attributes:
+                self.attributes.append(attribute)
+
+        self.attr_counts = self.attr_counts.sub(other.attr_counts, fill_value=0).reindex(self.attributes, fill_value=0).astype('int64')
+
+        if not other.feature_counts.empty:
+            self._add_feature_counts(-other.feature_counts)
+            self.feature_counts = self.feature_counts[self.feature_counts['Row Count'] != 0]
+
+        if not other.value_counts.empty:
+            self._add_value_counts(-other.value_counts)
+            self.value_counts = self.value_counts[self.value_counts != 0]
+
+        return self
+
+    def sorted_value_counts(self, attribute: str) -> pd.Series:
+
+        if attribute not in self.attributes or self.value_counts.empty:
+            return pd.Series(dtype='int64')
+
+        counts = self.value_counts[self.value_counts.index.get_level_values(0) == attribute].droplevel(0)
+
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def modes(self) -> pd.DataFrame:
+
+        modes = pd.DataFrame({'Mode': pd.Series(None, index=self.attributes, dtype=object), 'Freq. of Mode': 0})
+
+        if self.value_counts.empty:
+            return modes
+
+        top = self.value_counts.groupby(level=0, sort=False).transform('max')
+        ties = self.value_counts[self.value_counts == top]
+
+        # Series.mode() returns its result sorted, so the first tied value is the smallest
+
+        for attribute, group in ties.groupby(level=0, sort=False):
+
+            candidates = list(group.index.get_level_values(1))
+
+            try:
+                mode_value = min(candidates)
+            except TypeError:
+                mode_value = candidates[0]
+
+            modes.loc[attribute] = [mode_value, int(group.iloc[0])]
+
+        return modes
+
+    def unique_counts(self) -> pd.Series:
+
+        if self.value_counts.empty:
+            return pd.Series(0, index=self.attributes)
+
+        return self.value_counts.groupby(level=0, sort=False).size().reindex(self.attributes, fill_value=0)
+
+    def attribute_report(self) -> pd.DataFrame:
+
+        counts = self.attr_counts
+        count = counts['count']
+
+        unique_values = self.unique_counts()
+
+        modes = self.modes()
+
+        def completeness(key):
+            return (counts[key] / count.where(count > 0)).fillna(0).to_numpy()
+
+        return pd.DataFrame({
+            'Attribute': self.attributes,
+            'Count': count.to_numpy(),
+            'Name Count': counts['name'].to_numpy(),
+            'Name Completeness': completeness('name'),
+            'Name Count (eng)': counts['name:en'].to_numpy(),
+            'Name Completeness (eng)': completeness('name:en'),
+            'Address Count (Street)': counts['addr:street'].to_numpy(),
+            'Address Completeness (Street)': completeness('addr:street'),
+            'Unique Values': unique_values.to_numpy(),
+            'Mode': modes['Mode'].to_numpy(),
+            'Freq. of Mode': modes['Freq. of Mode'].astype('int64').to_numpy()
+        }, columns=ATTRIBUTE_REPORT_COLUMNS)
+
+    def values_report(self, top_n: int = None) -> pd.DataFrame:
+
+        if self.value_counts.empty:
+            return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in VALUES_REPORT_DTYPES.items()})
+
+        # One stable sort over all attributes: attribute order first, then count descending
+
+        report = self.value_counts.rename('counts').rename_axis(['attr_name', 'attr_values']).reset_index()
+
+        report['order'] = report['attr_name'].map({attribute: i for i, attribute in enumerate(self.attributes)})
+
+        report = report.sort_values(['order', 'counts'], ascending=[True, False], kind='stable').reset_index(drop=True)
+
+        if top_n is not None:
+            report = self.bounded_values(report, top_n)
+
+        report['freq (excl NaN)'] = report['counts'] / report['attr_name'].map(self.attr_counts['count'])
+
+        return report[list(VALUES_REPORT_DTYPES)]
+
+    def bounded_values(self, report: pd.DataFrame, top_n: int) -> pd.DataFrame:
+
+        # Keeps each attribute's top_n values and rolls the rest into an "Other (k values)" row,
+        # counted like the chart's "Other" bar as the attribute's count minus the kept values
+
+        rank = report.groupby('attr_name', sort=False).cumcount()
+
+        sizes = report.groupby('attr_name', sort=False).size()
+
+        tail = sizes[sizes > top_n].index
+
+        if len(tail) == 0:
+            return report
+
+        kept = report[rank < top_n]
+
+        kept_counts = kept.groupby('attr_name', sort=False)['counts'].sum().reindex(tail)
+
+        # Approximate statistics keep fewer values than they estimate to exist
+
+        rolled = np.maximum(self.unique_counts().reindex(tail).to_numpy(), sizes.reindex(tail).to_numpy()) - top_n
+
+        other = pd.DataFrame({
+            'attr_name': tail.to_numpy(),
+            'attr_values': [f"Other ({k} values)" for k in rolled],
+            'counts': (self.attr_counts['count'].reindex(tail) - kept_counts).to_numpy(),
+            'order': report.drop_duplicates('attr_name').set_index('attr_name')['order'].reindex(tail).to_numpy(),
+        })
+
+        report = pd.concat([kept.assign(rank=rank[rank < top_n]), other.assign(rank=top_n)], ignore_index=True)
+
+        return report.sort_values(['order', 'rank'], kind='stable').reset_index(drop=True)
+
+class ApproximateAreaStatistics(AreaStatistics):
+
+    """AreaStatistics whose value statistics live in fixed-size sketches.
+
+    Row, key and attribute counts stay exact. Per attribute, distinct values go into a
+    HyperLogLog (relative standard error 1.04 / sqrt(2**precision)) and value counts
+    are cut back to at most capacity heavy hitters after every chunk with the
+    Misra-Gries rule. A kept count is never above the true count and at most
+    errors[attribute] below it, which itself is at most count / (capacity + 1); every
+    value more frequent than that bound is guaranteed to be kept, so modes, top-N
+    values, chart data and the values report (limited to the kept values) are exact for
+    any attribute with at most capacity distinct values.
+
+    Only one chunk's exact counts exist at a time, and merge() combines sketches, so
+    memory stays fixed however many chunks, tables or areas are merged. Sketches cannot
+    give back what a row added, so subtract() raises a TypeError, which is why
+    SnapshotDiff always works on exact AreaStatistics.
+    """
+
+    def __init__(self, features: list = None, attributes: list = None, capacity: int = 1000, precision: int = 14, matrix_keys: list = None):
+        super().__init__(features, attributes, matrix_keys)
+        self.capacity = capacity
+        self.precision = precision
+        self.distinct = {}
+        self.errors = {}
+
+    def _add_value_counts(self, counts: pd.Series):
+
+        if counts.empty:
+            return
+
+        for attribute, group in counts.groupby(level=0, sort=False):
+            self.distinct.setdefault(attribute, HyperLogLog(self.precision)).update(group.index.get_level_values(1))
+
+        super()._add_value_counts(counts)
+
+        kept = []
+
+        for attribute, group in self.value_counts.groupby(level=0, sort=False):
+            group, threshold = heavy_hitters(group, self.capacity)
+            self.errors[attribute] = self.errors.get(attribute, 0) + threshold
+            kept.append(group)
+
+        self.value_counts = pd.concat(kept).astype('int64')
+
+    def merge(self, other: 'ApproximateAreaStatistics') -> 'ApproximateAreaStatistics':
+
+        super().merge(other)
+
+        for attribute, sketch in other.distinct.items():
+            self.distinct.setdefault(attribute, HyperLogLog(self.precision)).merge(sketch)
+
+        for attribute, error in other.errors.items():
+            self.errors[attribute] = self.errors.get(attribute, 0) + error
+
+        return self
+
+    def subtract(self, other: AreaStatistics) -> AreaStatistics:
+        raise TypeError(f"ApproximateAreaStatistics.subtract() is not supported: {type(other).__name__} cannot be subtracted from sketched statistics; use exact AreaStatistics")
+
+    def unique_counts(self) -> pd.Series:
+        return pd.Series([self.distinct[attribute].estimate() if attribute in self.distinct else 0 for attribute in self.attributes], index=self.attributes, dtype='int64')
@@ -0,0 +1,130 @@
+import pandas as pd
+from time import perf_counter
+from collections import OrderedDict
+from .DataLoader import CSVLoader, make_loader
+from .DataAggregator import AreaStatistics, COMPLETENESS_MATRIX_KEYS
+from .TagStore import TagStore
+from .ComputeBackend import make_backend
+
+# Classes for caching area data between pipeline stages
+
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+class AreaDataCache:
+
+    """Run-scoped, memoized store of area DataFrames.
+
+    Every transformer and the chart builder ask the cache for an area instead of
+    calling CSVLoader directly, so the four FME tables of an area are read once per
+    run. Frames are kept in least-recently-used order and evicted once their
+    combined deep memory usage exceeds max_bytes (None disables the budget).
+
+    Cached frames are shared between callers and must be treated as read-only.
+    loader_options are passed to make_loader on every miss, so source="osm" reads
+    .osm extracts instead of the FME tables. Streamed AreaStatistics are
+    memoized alongside the frames, so the attribute and values reports and the charts
+    of an area share one computation; statistics are small and are not counted in the
+    budget. load_stats records, per area, the time spent loading and the rows and bytes
+    read per table. With loader_options representation="sparse" areas are cached as
+    TagStores instead of frames. Statistics are computed by backend ('pandas' or
+    'arrow', see ComputeBackend); backends that never build the area frame also count
+    matrix_keys per feature_type while doing so, for the completeness matrix.
+    """
+
+    def __init__(self, folder_path: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES, loader_options: dict = None, backend = None, matrix_keys: list = None, backend_workers: int = None):
+        self.folder_path = folder_path
+        self.max_bytes = max_bytes
+        self.loader_options = loader_options or {}
+        self.backend = make_backend(backend, backend_workers)
+        self.matrix_keys = list(matrix_keys or COMPLETENESS_MATRIX_KEYS)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = OrderedDict()
+        self._statistics = {}
+        self.load_stats = {}
+
+    def get(self, area: str) -> pd.DataFrame:
+
+        if area in self._frames:
+            self._frames.move_to_end(area)
+            self.hits += 1
+            return self._frames[area][0]
+
+        self.misses += 1
+
+        start = perf_counter()
+
+        loader = make_loader(self.folder_path, area, **self.loader_options)
+        df = loader.load_dataframes()
+
+        self.record_load(area, loader, perf_counter() - start)
+
+        nbytes = df.nbytes if isinstance(df, TagStore) else int(df.memory_usage(deep=True).sum())
+
+        # A frame larger than the whole budget is handed out but never retained
+
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return df
+
+        self._frames[area] = (df, nbytes)
+        self.current_bytes += nbytes
+        self._evict()
+
+        return df
+
+    def get_statistics(self, area: str, chunksize: int = None) -> AreaStatistics:
+
+        if (area, chunksize) in self._statistics:
+            self.hits += 1
+            return self._statistics[(area, chunksize)]
+
+        stats = self.backend.statistics(self, area, chunksize)
+
+        self._statistics[(area, chunksize)] = stats
+
+        return stats
+
+    def record_load(self, area: str, loader, seconds: float):
+
+        # An area evicted and loaded again adds to its time; tables reflect the latest read
+
+        previous = self.load_stats.get(area, {'seconds': 0.0, 'loads': 0})
+
+        self.load_stats[area] = {'seconds': previous['seconds'] + seconds, 'loads': previous['loads'] + 1, 'tables': loader.table_stats}
+
+    def _evict(self):
+        while self.max_bytes is not None and self.current_bytes > self.max_bytes and len(self._frames) > 1:
+            _, (_, nbytes) = self._frames.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        self._frames.clear()
+        self._statistics.clear()
+        self.current_bytes = 0
+        self.backend.close()
+
+    def cache_info(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'areas': len(self._frames),
+            'statistics': len(self._statistics),
+            'current_bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+def load_area(folder_path: str, area: str, cache: AreaDataCache = None) -> pd.DataFrame:
+    if cache is None:
+        return CSVLoader(folder_path, area).load_dataframes()
+    return cache.get(area)
+
+def load_statistics(folder_path: str, area: str, chunksize: int = None, cache: AreaDataCache = None) -> AreaStatistics:
+    if cache is not None:
+        return cache.get_statistics(area, chunksize)
+    if chunksize is None:
+        return AreaStatistics.from_frame(CSVLoader(folder_path, area).load_dataframes())
+    return AreaStatistics.from_chunks(CSVLoader(folder_path, area), chunksize)
@@ -1,47 +1,853 @@
 # Classes for Data Loading
 
+import os
+import bz2
+import gzip
+import json
+import shutil
+import hashlib
+import weakref
+import tempfile
+from xml.etree.ElementTree import iterparse
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from .DataAggregator import COMPLETENESS_KEYS
+from .TagStore import TagStore
+
+# With sources=True, load_dataframes() adds this column naming where each row came from:
+# its table for CSV exports and its element type (node, way, relation) for .osm extracts
+
+SOURCE_COLUMN = '@source'
 
 class DataLoader(ABC):
     @abstractmethod
     def load_dataframes(self, area: str):
         pass
 
+def compact_dtypes(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+
+    # Repetitive text columns become categoricals, integers are downcast and floats are
+    # downcast only where float32 holds every value exactly
+
+    for column in df.columns:
+
+        values = df[column]
+
+        if pd.api.types.is_integer_dtype(values):
+            df[column] = pd.to_numeric(values, downcast='integer')
+
+        elif pd.api.types.is_float_dtype(values):
+            downcast = values.astype('float32')
+            if np.array_equal(downcast.to_numpy(dtype='float64'), values.to_numpy(), equal_nan=True):
+                df[column] = downcast
+
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            non_null = values.count()
+            if non_null and values.nunique() / non_null <= max_category_ratio:
+                df[column] = values.astype('category')
+
+    return df
+
+class ColumnarTableCache:
+
+    """Feather copies of the FME CSV tables, kept in {folder_path}\\table_cache.
+
+    Each table is converted once and recorded with the size, mtime and SHA-256 of
+    its source CSV. A copy is reused while size and mtime are unchanged; if only the
+    mtime moved (e.g. the export was copied again) the content hash decides. Copies
+    are written uncompressed so they can be memory-mapped on read. pyarrow is
+    optional: without it tables are parsed from CSV as before.
+    """
+
+    def __init__(self, folder_path: str):
+        self.cache_path = fr"{folder_path}\table_cache"
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def read_table(self, csv_path: str, table: str, columns: list = None) -> pd.DataFrame:
+
+        stat = os.stat(csv_path)
+
+        usecols = (lambda column: column in columns) if columns is not None else None
+
+        try:
+            from pyarrow import feather
+        except ImportError:
+            print("pyarrow is not installed, reading CSV without the columnar cache.")
+            return pd.read_csv(csv_path, usecols=usecols, low_memory=False)
+
+        data_path = fr"{self.cache_path}\{table}.feather"
+        meta_path = fr"{self.cache_path}\{table}.json"
+
+        meta = None
+
+        if os.path.exists(data_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+
+        if meta is not None and meta['size'] == stat.st_size:
+
+            if meta['mtime_ns'] != stat.st_mtime_ns:
+
+                if meta['sha256'] != self.file_hash(csv_path):
+                    meta = None
+                else:
+                    meta['mtime_ns'] = stat.st_mtime_ns
+                    self._write_meta(meta_path, meta)
+
+            if meta is not None:
+                table_data = feather.read_table(data_path, memory_map=True)
+                if columns is not None:
+                    table_data = table_data.select([column for column in table_data.column_names if column in columns])
+                return table_data.to_pandas()
+
+        df = pd.read_csv(csv_path, low_memory=False)
+
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            feather.write_feather(df, f"{data_path}.tmp", compression='uncompressed')
+            os.replace(f"{data_path}.tmp", data_path)
+            self._write_meta(meta_path, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': self.file_hash(csv_path)})
+        except Exception as e:
+            print(f"Could not write columnar cache for {table}: {e}")
+
+        if columns is not None:
+            df = df[[column for column in df.columns if column in columns]]
+
+        return df
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: dict):
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+def table_dtype(dtypes: set):
+
+    # The dtype a whole-table read infers for a column, given the dtypes inferred for its
+    # chunks: any text makes the column text, numbers widen to float across chunks
+
+    if any(pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype) for dtype in dtypes):
+        return 'str'
+
+    if len(dtypes) == 1:
+        return next(iter(dtypes))
+
+    if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in dtypes):
+        return 'float64'
+
+    return 'object'
+
+def sample_rows(df: pd.DataFrame) -> pd.DataFrame:
+
+    # The first row plus the first non-null row of every column: enough for pd.concat to
+    # resolve the same dtypes as it does for the whole frame
+
+    if df.empty:
+        return df
+
+    notna = df.notna().to_numpy()
+
+    rows = sorted({0} | set(notna.argmax(axis=0)[notna.any(axis=0)].tolist()))
+
+    return df.iloc[rows].reset_index(drop=True)
+
 class CSVLoader(DataLoader):
 
-    def __init__(self, folder_path: str,  area: str):
+    def __init__(self, folder_path: str,  area: str, columnar_cache: bool = False, columns = None, compact: bool = False, representation: str = 'dense', concurrent_tables: bool = False, sources: bool = False):
         self.folder_path = folder_path
         self.area = area
+        self.table_cache = ColumnarTableCache(folder_path) if columnar_cache else None
+        self.columns = columns
+        self.compact = compact
+        self.representation = representation
+        self.concurrent_tables = concurrent_tables
+        self.sources = sources
+        self.memory_report = {}
+        self.table_stats = {}
+        self.chunk_dtypes = {}
 
-    def load_dataframes(self):
-        
-        tables = []
+    def _read_table(self, table: str, columns: list = None) -> pd.DataFrame:
+
+        csv_path = fr"{self.folder_path}\tables\{table}.csv"
+
+        if self.table_cache is not None:
+            return self.table_cache.read_table(csv_path, table, columns)
+
+        usecols = (lambda column: column in columns) if columns is not None else None
+
+        return pd.read_csv(csv_path, usecols=usecols, low_memory=False)
+
+    def _load_concurrently(self, tables: list, columns: list = None) -> pd.DataFrame:
+
+        # The tables are parsed on a thread pool (the C parser and the columnar cache's
+        # Feather reads release the GIL), then joined by one concat and one unknown
+        # derivation. The table-by-table concat is replayed on a few sample rows per
+        # table first, so column order, dtypes and every value come out exactly as they
+        # do from the serial loop
+
+        def read(table):
+            try:
+                df = self._read_table(table, columns)
+            except FileNotFoundError:
+                return table, None, None
+            if self.sources:
+                df[SOURCE_COLUMN] = table
+            return table, df, sample_rows(df)
+
+        with ThreadPoolExecutor(max_workers=max(len(tables), 1)) as executor:
+            results = list(executor.map(read, tables))
+
+        frames = []
+        samples = []
+
+        for table, df, sample in results:
+
+            if df is None:
+                print(f"File {table}.csv not found in {self.folder_path}. Skipping this table.")
+                continue
+
+            self.table_stats[table] = {'rows': len(df), 'bytes': os.path.getsize(fr"{self.folder_path}\tables\{table}.csv")}
+
+            frames.append(df)
+            samples.append(sample)
+
+        replay = pd.DataFrame()
+        included = []
+        dtypes = {}
+
+        for i, sample in enumerate(samples):
+
+            if not sample.empty and not replay.empty:
+                replay = pd.concat([replay, sample], ignore_index=True)
+                included.append(i)
+            elif replay.empty:
+                replay = sample
+                included = [i]
+
+            if not replay.empty:
+                replay['unknown'] = None
+                replay.loc[replay['feature_type'] == "unknown", 'unknown'] = "unknown"
+
+            dtypes[i] = replay.dtypes
+
+        if replay.empty:
+            return frames[included[0]] if included else pd.DataFrame()
+
+        # Each table's columns go through every dtype the serial concat would have cast them to
+
+        parts = []
+
+        for position, i in enumerate(included):
+
+            df = frames[i]
+
+            for column in df.columns:
+                for k in included[position:]:
+                    if df[column].dtype != dtypes[k][column]:
+                        df = df.astype({column: dtypes[k][column]})
+
+            parts.append(df)
+
+        final_df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].copy()
+
+        final_df.insert(list(replay.columns).index('unknown'), 'unknown', None)
+        final_df.loc[final_df['feature_type'] == "unknown", 'unknown'] = "unknown"
+
+        return final_df
+
+    def required_columns(self) -> list:
+
+        # columns may be None (read everything), an explicit list, or "auto": the
+        # completeness keys plus every feature_type that occurs anywhere in the area
+
+        if self.columns is None:
+            return None
+
+        if self.columns != 'auto':
+            return ['feature_type'] + [column for column in self.columns if column != 'feature_type']
+
+        features = []
+
+        for table in self.tables():
+            try:
+                features.extend(self._read_table(table, ['feature_type'])['feature_type'].dropna().unique())
+            except FileNotFoundError:
+                continue
+
+        return ['feature_type'] + COMPLETENESS_KEYS + list(dict.fromkeys(features))
+
+    def tables(self) -> list:
 
         area = self.area.replace(' ', '')
 
-        tables = [f"{area}_points", f"{area}_lines", f"{area}_areas", f"{area}_collections"]
+        return [f"{area}_points", f"{area}_lines", f"{area}_areas", f"{area}_collections"]
+
+    def source_files(self) -> list:
+        return [fr"{self.folder_path}\tables\{table}.csv" for table in self.tables()]
+
+    def table_columns(self) -> set:
+
+        columns = set()
+
+        for table in self.tables():
+            try:
+                columns.update(pd.read_csv(fr"{self.folder_path}\tables\{table}.csv", nrows=0).columns)
+            except FileNotFoundError:
+                continue
+
+        return columns
+
+    def iter_chunks(self, chunksize: int, columns: list = None):
+
+        # Streams the area table by table in chunks of at most chunksize rows, reading only
+        # the requested columns that exist in each table
+
+        for table in self.tables():
+
+            csv_path = fr"{self.folder_path}\tables\{table}.csv"
+
+            try:
+                header = pd.read_csv(csv_path, nrows=0).columns
+            except FileNotFoundError:
+                print(f"File {table}.csv not found in {self.folder_path}. Skipping this table.")
+                continue
+
+            usecols = [column for column in header if columns is None or column in columns]
+
+            self.table_stats[table] = {'rows': 0, 'bytes': os.path.getsize(csv_path)}
+
+            # feature_type alone (the feature pass of streamed statistics) is only collected, never aggregated
+
+            dtypes = {column: dtype for column, dtype in self.table_dtypes(csv_path, chunksize).items() if column in usecols} if usecols != ['feature_type'] else {}
+
+            # Text and widened numeric columns are parsed as such; anything else is cast per chunk
+
+            read_dtypes = {column: dtype for column, dtype in dtypes.items() if dtype in ('str', 'float64')}
+
+            for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize, low_memory=False, dtype=read_dtypes):
+                for column, dtype in dtypes.items():
+                    if chunk[column].dtype != dtype:
+                        chunk[column] = chunk[column].astype(dtype)
+                self.table_stats[table]['rows'] += len(chunk)
+                chunk['unknown'] = None
+                chunk.loc[chunk['feature_type'] == "unknown", 'unknown'] = "unknown"
+                yield chunk
 
-        final_df = pd.DataFrame() 
+    def table_dtypes(self, csv_path: str, chunksize: int) -> dict:
 
-        for table in tables:
+        # pandas infers dtypes chunk by chunk, so a column holding numbers in its first rows
+        # and text later would be read as numbers in early chunks and as text in later ones.
+        # A first pass over the chunks pins every column to the dtype the in-memory path
+        # infers for the whole table. Each column is inferred on its own, so one pass over
+        # the full header serves every column subset read later
+
+        if csv_path not in self.chunk_dtypes:
+
+            seen = {}
+
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False):
+                for column, dtype in chunk.dtypes.items():
+                    seen.setdefault(column, set()).add(dtype)
+
+            self.chunk_dtypes[csv_path] = {column: table_dtype(dtypes) for column, dtypes in seen.items()}
+
+        return self.chunk_dtypes[csv_path]
+
+    def iter_tables(self, columns: list = None):
+
+        # Yields each table whole, with the unknown column derived per table
+
+        for table in self.tables():
 
             try:
+                df = self._read_table(table, columns)
+            except FileNotFoundError:
+                print(f"File {table}.csv not found in {self.folder_path}. Skipping this table.")
+                continue
+
+            self.table_stats[table] = {'rows': len(df), 'bytes': os.path.getsize(fr"{self.folder_path}\tables\{table}.csv")}
+
+            df['unknown'] = None
+            df.loc[df['feature_type'] == "unknown", 'unknown'] = "unknown"
+
+            yield df
+
+    def load_tag_store(self, chunksize: int = None) -> TagStore:
+
+        # Tables (or chunks of them, with chunksize) are converted to triples one at a
+        # time, so the dense frame of the whole area never exists
+
+        columns = self.required_columns()
+
+        frames = self.iter_chunks(chunksize, columns) if chunksize else self.iter_tables(columns)
+
+        store = TagStore.from_frames(frames)
 
-               df = pd.read_csv(fr"{self.folder_path}\tables\{table}.csv", low_memory=False)
+        print(f"{self.area}: stored {len(store.rows)} tag values for {len(store)} rows in {store.nbytes / 1024**2:.1f} MB.")
+
+        return store
+
+    def load_dataframes(self):
+
+        # With representation="sparse" the area is returned as a TagStore instead of a frame
+
+        if self.representation == 'sparse':
+            return self.load_tag_store()
+
+        tables = self.tables()
+
+        columns = self.required_columns()
+
+        final_df = self._load_concurrently(tables, columns) if self.concurrent_tables else pd.DataFrame()
+
+        for table in tables if not self.concurrent_tables else []:
+
+            try:
+
+               df = self._read_table(table, columns)
 
             except FileNotFoundError:
                 print(f"File {table}.csv not found in {self.folder_path}. Skipping this table.")
                 continue
 
+            self.table_stats[table] = {'rows': len(df), 'bytes': os.path.getsize(fr"{self.folder_path}\tables\{table}.csv")}
+
+            if self.sources:
+                df[SOURCE_COLUMN] = table
+
             if not df.empty and not final_df.empty:
                 final_df = pd.concat([final_df, df], ignore_index=True)
             elif  final_df.empty:
                 final_df = df
-            
+
             if not final_df.empty:
                 final_df['unknown'] = None
                 final_df.loc[final_df['feature_type'] == "unknown", 'unknown'] = "unknown"
 
+        if self.compact and not final_df.empty:
+
+            before = int(final_df.memory_usage(deep=True).sum())
+            final_df = compact_dtypes(final_df)
+            after = int(final_df.memory_usage(deep=True).sum())
+
+            self.memory_report = {'before': before, 'after': after}
+
+            print(f"{self.area}: compacted area frame from {before / 1024**2:.1f} MB to {after / 1024**2:.1f} MB.")
+
         return final_df
-        
\ No newline at end of file
+
+# Keys FME uses, in this order, to pick an OSM feature's feature_type
+
+OSM_PRIMARY_KEYS = [
+    'aerialway', 'aeroway', 'amenity', 'barrier', 'boundary', 'building', 'craft', 'emergency', 'geological',
+    'highway', 'historic', 'landuse', 'leisure', 'man_made', 'military', 'natural', 'office', 'place', 'power',
+    'public_transport', 'railway', 'route', 'shop', 'sport', 'tourism', 'waterway'
+]
+
+# A closed way carrying one of these keys is an area unless it is tagged area=no
+
+OSM_AREA_KEYS = {
+    'aeroway', 'amenity', 'building', 'building:part', 'craft', 'historic', 'landuse', 'leisure', 'man_made',
+    'military', 'natural', 'office', 'place', 'public_transport', 'shop', 'sport', 'tourism', 'water'
+}
+
+OSM_AREA_RELATIONS = {'multipolygon', 'boundary'}
+
+class OSMXMLLoader(DataLoader):
+
+    """Streams an .osm XML extract (plain, .gz or .bz2) into the same frames CSVLoader builds.
+
+    The extract is read with iterparse and every element is cleared once handled, so
+    parsing runs in constant memory. Tagged nodes become points, ways become lines or,
+    when closed and area-like, areas, and relations become areas (multipolygons and
+    boundaries) or collections. feature_type is the first of OSM_PRIMARY_KEYS the
+    element carries, otherwise "unknown"; every tag becomes a column next to osm_id, and
+    the COMPLETENESS_KEYS columns are always present, as in the FME export, even when
+    no element carries them.
+
+    Rows are produced in batches of batch_size per table, so iter_chunks() feeds
+    streamed statistics without holding the area. With columnar_cache each batch is
+    written to a Feather part under table_cache as it is parsed, and later loads read
+    the parts instead of the XML while the extract is unchanged. Without it, the batches
+    of the first streamed pass are kept as pickles in a temporary directory and replayed
+    by later passes, so table_columns() and the feature and statistics passes of a
+    streamed run parse the extract once. osm_path defaults to {area}.osm under the
+    folder's osm directory, or to {area}.osm.gz or {area}.osm.bz2 when only a
+    compressed extract is there; it may also be a file object, e.g. a
+    small in-memory fixture. concurrent_tables is accepted like
+    CSVLoader's and has no effect, as the extract is a single stream.
+    """
+
+    def __init__(self, folder_path: str, area: str, osm_path = None, columnar_cache: bool = False, columns = None, compact: bool = False, representation: str = 'dense', batch_size: int = 50_000, concurrent_tables: bool = False, sources: bool = False):
+        self.folder_path = folder_path
+        self.area = area
+        self.osm_path = osm_path if osm_path is not None else self.default_path(folder_path, area)
+        self.table_cache = ColumnarTableCache(folder_path) if columnar_cache and isinstance(self.osm_path, str) else None
+        self.columns = columns
+        self.compact = compact
+        self.representation = representation
+        self.batch_size = batch_size
+        self.sources = sources
+        self.memory_report = {}
+        self.table_stats = {}
+        self._columns = None
+        self._parts = None
+
+    @staticmethod
+    def default_path(folder_path: str, area: str) -> str:
+
+        # The plain extract wins; a missing area still reports the plain path
+
+        paths = [fr"{folder_path}\osm\{area}.osm{suffix}" for suffix in ('', '.gz', '.bz2')]
+
+        return next((path for path in paths if os.path.exists(path)), paths[0])
+
+    def tables(self) -> list:
+
+        # Same table names as the FME export, so reports and run statistics line up
+
+        area = self.area.replace(' ', '')
+
+        return [f"{area}_points", f"{area}_lines", f"{area}_areas", f"{area}_collections"]
+
+    def source_files(self) -> list:
+        return [self.osm_path] if isinstance(self.osm_path, str) else []
+
+    def _open(self):
+
+        if not isinstance(self.osm_path, str):
+            return self.osm_path
+
+        if self.osm_path.endswith('.gz'):
+            return gzip.open(self.osm_path, 'rb')
+
+        if self.osm_path.endswith('.bz2'):
+            return bz2.open(self.osm_path, 'rb')
+
+        return open(self.osm_path, 'rb')
+
+    @staticmethod
+    def feature_type(tags: dict) -> str:
+
+        for key in OSM_PRIMARY_KEYS:
+            if key in tags:
+                return key
+
+        return "unknown"
+
+    @staticmethod
+    def table_for(element: str, tags: dict, refs: list) -> str:
+
+        if element == 'node':
+            return 'points'
+
+        if element == 'relation':
+            return 'areas' if tags.get('type') in OSM_AREA_RELATIONS else 'collections'
+
+        closed = len(refs) > 2 and refs[0] == refs[-1]
+
+        if closed and tags.get('area') != 'no' and (tags.get('area') == 'yes' or any(key in tags for key in OSM_AREA_KEYS)):
+            return 'areas'
+
+        return 'lines'
+
+    def iter_elements(self):
+
+        # Yields (table, element, osm_id, tags) for every tagged element; untagged nodes and
+        # ways are only geometry of other features
+
+        source = self._open()
+
+        try:
+            root = None
+            tags = {}
+            refs = []
+
+            for event, elem in iterparse(source, events=('start', 'end')):
+
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    continue
+
+                if elem.tag == 'tag':
+                    tags[elem.get('k')] = elem.get('v')
+
+                elif elem.tag == 'nd':
+                    refs.append(elem.get('ref'))
+
+                elif elem.tag in ('node', 'way', 'relation'):
+
+                    if tags:
+                        yield self.table_for(elem.tag, tags, refs), elem.tag, int(elem.get('id')), tags
+
+                    tags = {}
+                    refs = []
+                    root.clear()
+
+        finally:
+            if source is not self.osm_path:
+                source.close()
+
+    def _parse_chunks(self, chunksize: int):
+
+        # Rows are buffered per table and released as a frame once chunksize is reached
+
+        names = dict(zip(['points', 'lines', 'areas', 'collections'], self.tables()))
+
+        buffers = {table: [] for table in names.values()}
+        columns = set()
+
+        self.table_stats = {table: {'rows': 0, 'bytes': 0} for table in names.values()}
+
+        if isinstance(self.osm_path, str):
+            self.table_stats[os.path.basename(self.osm_path)] = {'rows': 0, 'bytes': os.path.getsize(self.osm_path)}
+
+        for kind, element, osm_id, tags in self.iter_elements():
+
+            table = names[kind]
+
+            row = {key: value for key, value in tags.items() if key not in ('osm_id', 'feature_type', SOURCE_COLUMN)}
+            row['osm_id'] = osm_id
+            row['feature_type'] = self.feature_type(tags)
+
+            columns.update(row)
+
+            # Kept with every batch, so cached and spilled parts can still tell ways from relations
+
+            row[SOURCE_COLUMN] = element
+
+            buffers[table].append(row)
+            self.table_stats[table]['rows'] += 1
+
+            if len(buffers[table]) >= chunksize:
+                yield table, self._frame(buffers[table])
+                buffers[table] = []
+
+        for table, rows in buffers.items():
+            if rows:
+                yield table, self._frame(rows)
+
+        self._columns = columns
+
+    @staticmethod
+    def _frame(rows: list) -> pd.DataFrame:
+
+        df = pd.DataFrame.from_records(rows)
+
+        return df[['osm_id', 'feature_type'] + [column for column in df.columns if column not in ('osm_id', 'feature_type', SOURCE_COLUMN)] + [SOURCE_COLUMN]]
+
+    def _cached_chunks(self, chunksize: int):
+
+        # Feather parts written while parsing; the extract is only parsed again once it changes
+
+        cache_path = self.table_cache.cache_path
+        meta_path = fr"{cache_path}\{self.area}_osm.json"
+
+        stat = os.stat(self.osm_path)
+
+        meta = None
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+
+        if meta is not None and meta['size'] == stat.st_size and (meta['mtime_ns'] == stat.st_mtime_ns or meta['sha256'] == ColumnarTableCache.file_hash(self.osm_path)):
+
+            from pyarrow import feather
+
+            self.table_stats = meta['table_stats']
+            self._columns = set(meta['columns'])
+
+            for table, part in meta['parts']:
+                yield table, feather.read_table(fr"{cache_path}\{part}", memory_map=True).to_pandas()
+
+            return
+
+        from pyarrow import feather
+
+        os.makedirs(cache_path, exist_ok=True)
+
+        if meta is not None:
+            for _, part in meta['parts']:
+                if os.path.exists(fr"{cache_path}\{part}"):
+                    os.remove(fr"{cache_path}\{part}")
+
+        parts = []
+
+        for table, df in self._parse_chunks(chunksize):
+            part = f"{table}_{len(parts):05d}.feather"
+            feather.write_feather(df, fr"{cache_path}\{part}", compression='uncompressed')
+            parts.append((table, part))
+            yield table, df
+
+        ColumnarTableCache._write_meta(meta_path, {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': ColumnarTableCache.file_hash(self.osm_path),
+            'parts': parts,
+            'columns': sorted(self._columns),
+            'table_stats': self.table_stats,
+        })
+
+    def _spilled_chunks(self, chunksize: int):
+
+        # Parses the extract once, keeping every batch on disk until the loader is discarded
+
+        directory = tempfile.mkdtemp(prefix='osm_etl_osm_')
+        weakref.finalize(self, shutil.rmtree, directory, True)
+
+        parts = []
+
+        for table, df in self._parse_chunks(chunksize):
+            part = os.path.join(directory, f"{len(parts):05d}.pkl")
+            df.to_pickle(part)
+            parts.append((table, part))
+            yield table, df
+
+        self._parts = parts
+
+    def _replayed_chunks(self, chunksize: int):
+
+        # Parts hold batches of the first pass's size, so they are re-cut to chunksize
+
+        for table, part in self._parts:
+            df = pd.read_pickle(part)
+            for start in range(0, len(df), chunksize):
+                yield table, df.iloc[start:start + chunksize].reset_index(drop=True)
+
+    def _table_chunks(self, chunksize: int, spill: bool = False):
+
+        if self.table_cache is not None:
+            try:
+                import pyarrow
+                return self._cached_chunks(chunksize)
+            except ImportError:
+                print("pyarrow is not installed, parsing the OSM extract without the columnar cache.")
+
+        if self._parts is not None:
+            return self._replayed_chunks(chunksize)
+
+        return self._spilled_chunks(chunksize) if spill else self._parse_chunks(chunksize)
+
+    def _with_completeness_keys(self, df: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+
+        for key in COMPLETENESS_KEYS:
+            if key not in df.columns and (columns is None or key in columns):
+                df[key] = None
+
+        return df
+
+    def table_columns(self) -> set:
+
+        # Known after one full pass; otherwise the extract is scanned for its tag keys
+
+        if self._columns is None:
+            for _ in self._table_chunks(self.batch_size, spill=True):
+                pass
+
+        return set(self._columns) | set(COMPLETENESS_KEYS)
+
+    def required_columns(self) -> list:
+
+        # feature_type is always one of OSM_PRIMARY_KEYS or "unknown", so "auto" needs no scan
+
+        if self.columns is None:
+            return None
+
+        if self.columns != 'auto':
+            return ['feature_type'] + [column for column in self.columns if column != 'feature_type']
+
+        return ['feature_type'] + COMPLETENESS_KEYS + OSM_PRIMARY_KEYS
+
+    def iter_chunks(self, chunksize: int, columns: list = None, spill: bool = True):
+
+        # Streamed runs read the extract more than once, so by default the first pass is spilled
+
+        for _, chunk in self._table_chunks(chunksize, spill):
+
+            chunk = chunk.drop(columns=SOURCE_COLUMN, errors='ignore')
+
+            if columns is not None:
+                chunk = chunk[[column for column in chunk.columns if column in columns]]
+
+            chunk = self._with_completeness_keys(chunk, columns)
+
+            chunk['unknown'] = None
+            chunk.loc[chunk['feature_type'] == "unknown", 'unknown'] = "unknown"
+
+            yield chunk
+
+    def load_tag_store(self, chunksize: int = None) -> TagStore:
+
+        store = TagStore.from_frames(self.iter_chunks(chunksize or self.batch_size, self.required_columns(), spill=False))
+
+        print(f"{self.area}: stored {len(store.rows)} tag values for {len(store)} rows in {store.nbytes / 1024**2:.1f} MB.")
+
+        return store
+
+    def load_dataframes(self):
+
+        if self.representation == 'sparse':
+            return self.load_tag_store()
+
+        # Chunks arrive in document order (nodes, ways, relations); they are regrouped into
+        # the points, lines, areas, collections order of the CSV tables
+
+        columns = self.required_columns()
+
+        chunks = {table: [] for table in self.tables()}
+
+        for table, chunk in self._table_chunks(self.batch_size):
+
+            # Parts cached before element types were kept fall back to their table
+
+            element = chunk.pop(SOURCE_COLUMN) if SOURCE_COLUMN in chunk.columns else pd.Series(table, index=chunk.index)
+
+            if columns is not None:
+                chunk = chunk[[column for column in chunk.columns if column in columns]]
+
+            if self.sources:
+                chunk[SOURCE_COLUMN] = element
+
+            chunks[table].append(chunk)
+
+        frames = [chunk for table in self.tables() for chunk in chunks[table]]
+
+        if not frames:
+            return pd.DataFrame()
+
+        final_df = self._with_completeness_keys(pd.concat(frames, ignore_index=True), columns)
+
+        final_df['unknown'] = None
+        final_df.loc[final_df['feature_type'] == "unknown", 'unknown'] = "unknown"
+
+        if self.compact:
+
+            before = int(final_df.memory_usage(deep=True).sum())
+            final_df = compact_dtypes(final_df)
+            after = int(final_df.memory_usage(deep=True).sum())
+
+            self.memory_report = {'before': before, 'after': after}
+
+            print(f"{self.area}: compacted area frame from {before / 1024**2:.1f} MB to {after / 1024**2:.1f} MB.")
+
+        return final_df
+
+def make_loader(folder_path: str, area: str, source: str = 'csv', **options) -> DataLoader:
+
+    # source="csv" reads the FME table exports, source="osm" the area's .osm extract
+
+    if source == 'osm':
+        return OSMXMLLoader(folder_path, area, **options)
+
+    return CSVLoader(folder_path, area, **options)
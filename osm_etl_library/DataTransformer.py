@@ -1,6 +1,18 @@
+import os
 import pandas as pd
 from abc import ABC, abstractmethod
-from .DataLoader import CSVLoader
+from .DataCache import AreaDataCache, load_area, load_statistics
+from .DataAggregator import COMPLETENESS_MATRIX_KEYS, feature_key_counts
+from .DataLoader import make_loader
+from .TagStore import TagStore
+
+MATRIX_CHUNKSIZE = 500_000
+
+# Data rows per sheet: Excel's 1,048,576-row limit less the header row
+
+EXCEL_MAX_ROWS = 1_048_575
+
+VALUES_SPILL_MODES = ('parquet', 'sheets')
 
 # Classes for Data Transformation
 
@@ -9,11 +21,20 @@ class OverviewDataTransformer(ABC):
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         pass
 
+    def from_statistics(self) -> bool:
+
+        # Streamed runs and backends that never build the area frame (see ComputeBackend)
+        # take every figure from AreaStatistics
+
+        return self.chunksize is not None or (self.cache is not None and not self.cache.backend.uses_frames)
+
 class OSMCompletenessTransformer(OverviewDataTransformer):
 
-    def __init__(self, folder_path, areas: list):
+    def __init__(self, folder_path, areas: list, cache: AreaDataCache = None, chunksize: int = None):
         self.folder_path = folder_path
         self.areas = areas
+        self.cache = cache
+        self.chunksize = chunksize
 
     def transform(self) -> pd.DataFrame:
 
@@ -32,12 +53,29 @@ class OSMCompletenessTransformer(OverviewDataTransformer):
 
         for area in self.areas:
 
-            df = CSVLoader(self.folder_path, area).load_dataframes()
+            if self.from_statistics():
+
+                stats = load_statistics(self.folder_path, area, self.chunksize, self.cache)
+
+                row_count = stats.row_count
+                name_count = stats.key_counts['name']
+                name_count_eng = stats.key_counts['name:en']
+                street_count = stats.key_counts['addr:street']
+
+            else:
 
-            row_count = len(df)
-            name_count = len(df[df['name'].isnull() == False])
-            name_count_eng = len(df[df['name:en'].isnull() == False])
-            street_count = len(df[df['addr:street'].isnull() == False])
+                df = load_area(self.folder_path, area, self.cache)
+
+                row_count = len(df)
+
+                if isinstance(df, TagStore):
+                    name_count = df.count('name')
+                    name_count_eng = df.count('name:en')
+                    street_count = df.count('addr:street')
+                else:
+                    name_count = len(df[df['name'].isnull() == False])
+                    name_count_eng = len(df[df['name:en'].isnull() == False])
+                    street_count = len(df[df['addr:street'].isnull() == False])
 
             data = pd.DataFrame({
             'Area of Interest': [area],
@@ -57,111 +95,194 @@ class OSMCompletenessTransformer(OverviewDataTransformer):
 
         return gen_report
         
+class CompletenessMatrixTransformer(OverviewDataTransformer):
+
+    """Completeness of every key in keys, per area and feature_type.
+
+    Each area is reduced to a feature_type x key table of not-null counts by a single
+    groupby over the not-null matrix of all keys (or a bincount per key of a TagStore),
+    and the tables of all areas are divided by their row counts together. Areas are
+    taken from the cache when it holds complete frames. Streamed runs and
+    statistics-only backends count the cache's matrix_keys in their statistics pass
+    (AreaStatistics.feature_counts), so the matrix is read from there; only keys outside
+    those, or areas of projected runs, are streamed from the source once more.
+    """
+
+    def __init__(self, folder_path: str, areas: list, cache: AreaDataCache = None, chunksize: int = None, keys: list = None):
+        self.folder_path = folder_path
+        self.areas = areas
+        self.cache = cache
+        self.chunksize = chunksize
+        self.keys = list(keys or COMPLETENESS_MATRIX_KEYS)
+
+    def area_counts(self, area: str) -> pd.DataFrame:
+
+        complete_frames = self.cache is None or (self.cache.backend.uses_frames and self.cache.loader_options.get('columns') is None)
+
+        if self.chunksize is None and complete_frames:
+
+            df = load_area(self.folder_path, area, self.cache)
+
+            if not isinstance(df, TagStore):
+                return feature_key_counts(df, self.keys)
+
+            counts = pd.DataFrame({key: df.feature_counts(key) for key in self.keys}, index=pd.Index(df.features, dtype=object), columns=self.keys, dtype='int64')
+            counts.insert(0, 'Row Count', df.feature_counts())
+
+            return counts
+
+        if self.from_statistics():
+
+            stats = load_statistics(self.folder_path, area, self.chunksize, self.cache)
+
+            if set(self.keys) <= set(stats.matrix_keys):
+                return stats.feature_counts[['Row Count'] + self.keys]
+
+        options = dict(self.cache.loader_options if self.cache is not None else {}, representation='dense')
+
+        loader = make_loader(self.folder_path, area, **options)
+
+        chunks = [feature_key_counts(chunk, self.keys) for chunk in loader.iter_chunks(self.chunksize or MATRIX_CHUNKSIZE, columns=['feature_type'] + self.keys)]
+
+        if not chunks:
+            return feature_key_counts(pd.DataFrame({'feature_type': pd.Series(dtype=object)}), self.keys)
+
+        return pd.concat(chunks).groupby(level=0, sort=False, dropna=False).sum()
+
+    def transform(self) -> pd.DataFrame:
+
+        counts = [self.area_counts(area) for area in self.areas]
+
+        columns = ['Area of Interest', 'Feature Type', 'Row Count'] + [f'{key} Completeness' for key in self.keys]
+
+        if not counts:
+            return pd.DataFrame(columns=columns)
+
+        counts = pd.concat(counts, keys=self.areas, names=['Area of Interest', 'Feature Type'])
+
+        completeness = counts[self.keys].div(counts['Row Count'].where(counts['Row Count'] > 0), axis=0).fillna(0)
+        completeness.columns = columns[3:]
+
+        report = pd.concat([counts[['Row Count']], completeness], axis=1).reset_index()
+
+        return report[columns]
+
 class AttributeReportTransformer(OverviewDataTransformer):
 
-    def __init__(self, folder_path: str, area: str):
+    def __init__(self, folder_path: str, area: str, cache: AreaDataCache = None, chunksize: int = None):
         self.folder_path = folder_path
         self.area = area
+        self.cache = cache
+        self.chunksize = chunksize
 
     def transform(self) -> pd.DataFrame:
-        
-        attr_report = pd.DataFrame({
-        'Attribute': pd.Series(dtype='str'),
-        'Count': pd.Series(dtype='int'),
-        'Name Count': pd.Series(dtype='int'),
-        'Name Completeness': pd.Series(dtype='str'),
-        'Name Count (eng)': pd.Series(dtype='int'),
-        'Name Completeness (eng)': pd.Series(dtype='str'),
-        'Address Count (Street)': pd.Series(dtype='int'),
-        'Address Completeness (Street)': pd.Series(dtype='str'), 
-        'Unique Values': pd.Series(dtype='int'),
-        'Mode': pd.Series(dtype='int'),
-        'Freq. of Mode': pd.Series(dtype='int')
-        })    
-
-        df = CSVLoader(self.folder_path, self.area).load_dataframes()  
-
-        features = list(df['feature_type'].unique())
-
-        for feature in features:
-
-            if feature in list(df.columns):
-
-                attribute = feature
-                attr = df[df[attribute].isnull() == False]
-                count = len(attr)
-                name_count = len(attr[attr['name'].isnull() == False])
-                name_count_eng = len(attr[attr['name:en'].isnull() == False])
-                address_count = len(attr[attr['addr:street'].isnull() == False])
-                mode_value = attr[attribute].mode()[0] if not attr[attribute].mode().empty else None
-                mode_count = int((attr[attribute] == mode_value).sum())
-                unique_values = len(attr[attribute].unique())       
-
-                data = pd.DataFrame({
-                    'Attribute': [attribute],
-                    'Count': [count],
-                    'Name Count': [name_count],
-                    'Name Completeness': [(name_count/count) if count > 0 else 0],
-                    'Name Count (eng)': name_count_eng,
-                    'Name Completeness (eng)': [name_count_eng/count if count > 0 else 0],
-                    'Address Count (Street)': [address_count],
-                    'Address Completeness (Street)': [address_count/count if count > 0 else 0], 
-                    'Unique Values': [unique_values],
-                    'Mode': [mode_value],
-                    'Freq. of Mode': [mode_count]
-                })                         
-
-                if not attr_report.empty:
-                    attr_report = pd.concat([attr_report, data], ignore_index=True)
-                elif attr_report.empty:
-                    attr_report = data
-
-        return attr_report
+
+        # Counts, completeness, unique values and modes for every attribute come from one
+        # shared AreaStatistics pass instead of a filtered copy of the frame per attribute
+
+        stats = load_statistics(self.folder_path, self.area, self.chunksize, self.cache)
+
+        return stats.attribute_report()
 
 
 class ValuesReportTransformer(OverviewDataTransformer):
 
-    def __init__(self, folder_path: str, area: str):
+    """Values report of one area, optionally bounded to the top_n values per attribute.
+
+    With top_n, each attribute's remaining values are rolled into one "Other (k values)"
+    row, as in the charts, so the sheet has at most top_n + 1 rows per attribute. spill
+    keeps the full detail as well: 'parquet' writes it to
+    reports\\values\\{area}_values_report.parquet (zstd-compressed) and 'sheets' adds it
+    as {area}_values_detail sheets of at most shard_rows rows each. Without top_n,
+    'sheets' shards the values report itself, so no sheet exceeds Excel's row limit.
+    The parquet detail stores attr_values as text and needs pyarrow (the columnar extra).
+    """
+
+    def __init__(self, folder_path: str, area: str, cache: AreaDataCache = None, chunksize: int = None, top_n: int = None, spill: str = None, shard_rows: int = EXCEL_MAX_ROWS):
         self.folder_path = folder_path
         self.area = area
+        self.cache = cache
+        self.chunksize = chunksize
+        self.top_n = top_n
+        self.spill = spill
+        self.shard_rows = shard_rows
+
+        if spill is not None and spill not in VALUES_SPILL_MODES:
+            raise ValueError(f"Unknown values spill mode '{spill}', expected one of {', '.join(VALUES_SPILL_MODES)}")
+
+        # pyarrow is only the columnar extra, so a parquet spill fails here rather than after the statistics pass
+
+        if spill == 'parquet':
+            try:
+                import pyarrow
+            except ImportError:
+                raise ImportError("spill='parquet' needs pyarrow, install it with `pip install osm_etl_library[columnar]` or use spill='sheets'") from None
 
     def transform(self) -> pd.DataFrame:
 
-        attr_value_report = pd.DataFrame({
-        'attr_name': pd.Series(dtype='str'),
-        'attr_values':pd.Series(dtype='str'),
-        'counts':pd.Series(dtype='int'),
-        'freq (excl NaN)':pd.Series(dtype='float')
-        })
-               
-        df = CSVLoader(self.folder_path, self.area).load_dataframes()  
+        stats = load_statistics(self.folder_path, self.area, self.chunksize, self.cache)
 
-        features = list(df['feature_type'].unique())
+        return stats.values_report(self.top_n)
 
-        for feature in features:
-            
-            attribute = feature
-            attr = df[df[attribute].isnull() == False]
-            attr_value = attr[attribute].value_counts().rename_axis('attr_values').reset_index(name='counts')
-            attr_value['attr_name'] = attribute
-            attr_value = attr_value[['attr_name', 'attr_values', 'counts']]
-            attr_value['freq (excl NaN)'] = attr_value['counts']/len(attr)
-            attr_value_report = pd.concat([attr_value_report, attr_value], ignore_index=True)
-            
-        return attr_value_report 
+    def shards(self, report: pd.DataFrame, sheet_name: str) -> dict:
+
+        sheets = {}
+
+        for i, start in enumerate(range(0, max(len(report), 1), self.shard_rows)):
+            sheets[sheet_name if i == 0 else f"{sheet_name}_{i + 1}"] = report.iloc[start:start + self.shard_rows].reset_index(drop=True)
+
+        return sheets
+
+    def spill_path(self) -> str:
+        return fr"{self.folder_path}\reports\values\{self.area}_values_report.parquet"
+
+    def sheets(self) -> dict:
+
+        # Sheets for the data report; the parquet detail is written here as a side effect
+
+        stats = load_statistics(self.folder_path, self.area, self.chunksize, self.cache)
+
+        report = stats.values_report(self.top_n)
+
+        if self.spill is None:
+            return {f'{self.area}_values_report': report}
+
+        if self.spill == 'sheets' and self.top_n is None:
+            return self.shards(report, f'{self.area}_values_report')
+
+        detail = stats.values_report() if self.top_n is not None else report
+
+        if self.spill == 'sheets':
+            return {f'{self.area}_values_report': report, **self.shards(detail, f'{self.area}_values_detail')}
+
+        os.makedirs(fr"{self.folder_path}\reports\values", exist_ok=True)
+
+        # A tag's values can be read as numbers and text at once, which a parquet column cannot hold
+
+        detail = detail.assign(attr_values=detail['attr_values'].astype('str'))
+
+        detail.to_parquet(self.spill_path(), compression='zstd', index=False)
+
+        print(f"step: spill_values_report, ✅ Full values report for {self.area} written to {self.spill_path()}.")
+
+        return {f'{self.area}_values_report': report}
 
 
 class ChartsReportSheetTransformer(OverviewDataTransformer):
 
-    def __init__(self, folder_path: str, area: str):
+    def __init__(self, folder_path: str, area: str, cache: AreaDataCache = None, chunksize: int = None):
         self.folder_path = folder_path
         self.area = area
+        self.cache = cache
+        self.chunksize = chunksize
 
     def transform(self) -> pd.DataFrame:
 
-        df = CSVLoader(self.folder_path, self.area).load_dataframes()
-
-        features = list(df['feature_type'].unique())
+        if self.from_statistics():
+            features = load_statistics(self.folder_path, self.area, self.chunksize, self.cache).features
+        else:
+            df = load_area(self.folder_path, self.area, self.cache)
+            features = list(df.features) if isinstance(df, TagStore) else list(df['feature_type'].unique())
 
         graph_df = pd.DataFrame({'Category': features})
 
@@ -176,38 +297,45 @@ class TransformPipeline(ABC):
 
 class TransformPipelineReport(TransformPipeline):
 
-    def __init__(self, folder_path: str, areas: list):
+    def __init__(self, folder_path: str, areas: list, cache: AreaDataCache = None, chunksize: int = None, completeness_keys: list = None, values_options: dict = None):
         self.folder_path = folder_path
         self.areas = areas
+        self.cache = cache
+        self.chunksize = chunksize
+        self.completeness_keys = completeness_keys
+        self.values_options = values_options or {}
         
     def run_transforms(self) -> dict:
 
         excel_dict = {}
 
-        gen_report = OSMCompletenessTransformer(self.folder_path, self.areas).transform()
+        gen_report = OSMCompletenessTransformer(self.folder_path, self.areas, self.cache, self.chunksize).transform()
 
         excel_dict['completeness_overview'] = gen_report
+        excel_dict['completeness_matrix'] = CompletenessMatrixTransformer(self.folder_path, self.areas, self.cache, self.chunksize, self.completeness_keys).transform()
 
         for area in self.areas:
-            attr_report = AttributeReportTransformer(self.folder_path, area).transform()
-            values_report = ValuesReportTransformer(self.folder_path, area).transform()
+            attr_report = AttributeReportTransformer(self.folder_path, area, self.cache, self.chunksize).transform()
+            values_sheets = ValuesReportTransformer(self.folder_path, area, self.cache, self.chunksize, **self.values_options).sheets()
             excel_dict[f'{area}_attr_report'] = attr_report
-            excel_dict[f'{area}_values_report'] = values_report
+            excel_dict.update(values_sheets)
             
         return excel_dict
     
 class TransformPipelineCharts(TransformPipeline):
 
-    def __init__(self, folder_path: str, areas: list):
+    def __init__(self, folder_path: str, areas: list, cache: AreaDataCache = None, chunksize: int = None):
         self.folder_path = folder_path
         self.areas = areas
+        self.cache = cache
+        self.chunksize = chunksize
         
     def run_transforms(self) -> dict:
 
         excel_dict = {}
 
         for area in self.areas:
-            chart_report = ChartsReportSheetTransformer(self.folder_path, area).transform()
+            chart_report = ChartsReportSheetTransformer(self.folder_path, area, self.cache, self.chunksize).transform()
             excel_dict[f'{area}_charts'] = chart_report
             
         return excel_dict
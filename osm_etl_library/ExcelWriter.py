@@ -1,6 +1,11 @@
 import openpyxl
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border
+from openpyxl.utils import get_column_letter
 from abc import ABC, abstractmethod
+from .ExcelFormatter import completeness_rule, freq_scale_rule, is_completeness_header, is_freq_header, is_values_report, GROUP_BORDER_SIDE
 
 # Classes for Data Writing
 
@@ -13,6 +18,8 @@ class ExcelWriter(DataWriter):
     def __init__(self, excel_dict: dict, folder_path: str):
         self.excel_dict = excel_dict
         self.folder_path = folder_path
+        self.sheets_written = 0
+        self.cells_written = 0
 
     def write_dataframes(self):
         try:
@@ -20,7 +27,140 @@ class ExcelWriter(DataWriter):
                 for sheet_name, df in self.excel_dict.items():
                     if not df.empty:
                         df.to_excel(writer, sheet_name=sheet_name, index=False)
+                        self.sheets_written += 1
+                        self.cells_written += (len(df) + 1) * len(df.columns)
             return print(f"step: write_excel_sheets, ✅ Excel file '{self.folder_path}' created successfully with {len(self.excel_dict)} sheets.")
         except Exception as e:
             return f"step: write_excel_sheets, ❌ Error creating Excel file '{self.folder_path}': {e}"
 
+
+class StreamingExcelWriter(DataWriter):
+
+    """Writes the data report in openpyxl write-only mode, formatted as it is written.
+
+    Rows are streamed to disk with constant memory. Column widths, percentage number
+    formats, freeze panes, auto-filters, colour scales and the values-report group
+    borders are derived from the DataFrames themselves, so the report does not need to
+    be reloaded and reformatted by ExcelFormatterPipeline afterwards.
+    """
+
+    def __init__(self, excel_dict: dict, folder_path: str):
+        self.excel_dict = excel_dict
+        self.folder_path = folder_path
+        self.sheets_written = 0
+        self.cells_written = 0
+
+    @staticmethod
+    def cell_text(value) -> str:
+
+        # openpyxl stores floats with 16 significant digits and reads whole numbers back as ints
+
+        if isinstance(value, float):
+            value = float("%.16g" % value)
+            if value.is_integer():
+                value = int(value)
+
+        return str(value)
+
+    @classmethod
+    def column_width(cls, header, values: pd.Series) -> int:
+
+        # Same rule as the formatter: longest str() of every non-empty cell, plus padding
+
+        text = values[values.notna()].map(cls.cell_text)
+        text = text[~text.isin(['', '0', '0.0', 'False'])]
+
+        lengths = [len(str(header))] if header else []
+
+        if not text.empty:
+            lengths.append(int(text.str.len().max()))
+
+        return max(lengths, default=0) + 2
+
+    def write_sheet(self, wb, sheet_name: str, df: pd.DataFrame):
+
+        ws = wb.create_sheet(sheet_name)
+
+        headers = list(df.columns)
+        max_row = len(df) + 1
+        last_col_letter = get_column_letter(len(headers))
+
+        for i, header in enumerate(headers):
+            ws.column_dimensions[get_column_letter(i + 1)].width = self.column_width(header, df[header])
+
+        ws.freeze_panes = "B1"
+        ws.auto_filter.ref = f"A1:{last_col_letter}1"
+
+        percent_cols = {i for i, header in enumerate(headers) if is_completeness_header(header) or is_freq_header(header)}
+
+        for i, header in enumerate(headers):
+            if is_completeness_header(header):
+                col_letter = get_column_letter(i + 1)
+                ws.conditional_formatting.add(f"{col_letter}2:{col_letter}{max_row}", completeness_rule())
+
+        # Values reports get a bottom border on the last row of every attribute group
+
+        border_rows = set()
+
+        if is_values_report(sheet_name):
+
+            freq_cols = [i for i, header in enumerate(headers) if str(header).strip().lower() == "freq (excl nan)"]
+
+            if freq_cols:
+                col_letter = get_column_letter(freq_cols[0] + 1)
+                ws.conditional_formatting.add(f"{col_letter}2:{col_letter}{max_row}", freq_scale_rule())
+
+            if len(df) > 1:
+                first = df.iloc[:, 0]
+                changes = (first != first.shift(-1)).to_numpy()[:-1]
+                border_rows = set(changes.nonzero()[0])
+
+        ws.append(headers)
+
+        border = Border(bottom=GROUP_BORDER_SIDE)
+
+        columns = [df[header].astype(object).where(df[header].notna(), None).tolist() for header in headers]
+
+        for row_index, values in enumerate(zip(*columns)):
+
+            bordered = row_index in border_rows
+
+            if not bordered and not percent_cols:
+                ws.append(values)
+                continue
+
+            row = []
+
+            for i, value in enumerate(values):
+
+                if not bordered and (i not in percent_cols or not isinstance(value, (int, float))):
+                    row.append(value)
+                    continue
+
+                cell = WriteOnlyCell(ws, value=value)
+
+                if i in percent_cols and isinstance(value, (int, float)):
+                    cell.number_format = '0.00%'
+
+                if bordered:
+                    cell.border = border
+
+                row.append(cell)
+
+            ws.append(row)
+
+    def write_dataframes(self):
+        try:
+            wb = Workbook(write_only=True)
+
+            for sheet_name, df in self.excel_dict.items():
+                if not df.empty:
+                    self.write_sheet(wb, sheet_name, df)
+                    self.sheets_written += 1
+                    self.cells_written += (len(df) + 1) * len(df.columns)
+
+            wb.save(self.folder_path)
+
+            return print(f"step: write_excel_sheets, ✅ Excel file '{self.folder_path}' created and formatted successfully with {len(self.excel_dict)} sheets.")
+        except Exception as e:
+            return f"step: write_excel_sheets, ❌ Error creating Excel file '{self.folder_path}': {e}"
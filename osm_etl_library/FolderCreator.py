@@ -1,11 +1,4 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image as XLImage
-from openpyxl.utils import get_column_letter
-from openpyxl.formatting.rule import ColorScaleRule
-from openpyxl.styles import Border, Side
 from abc import ABC, abstractmethod
 
 # Abstract Base Class for Folder Creation
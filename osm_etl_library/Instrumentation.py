@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import cProfile
+import threading
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Classes for timing, memory sampling and profiling of pipeline runs
+
+class CProfileHook:
+
+    # Profiles a stage deterministically and writes {output_path}\{label}.prof (open with pstats or snakeviz)
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+
+    @contextmanager
+    def __call__(self, label: str):
+
+        profile = cProfile.Profile()
+        profile.enable()
+
+        try:
+            yield
+        finally:
+            profile.disable()
+            os.makedirs(self.output_path, exist_ok=True)
+            profile.dump_stats(fr"{self.output_path}\{label}.prof")
+
+class SamplingProfilerHook:
+
+    """Samples the stack of the calling thread every interval seconds while a stage runs.
+
+    Stacks are written as {output_path}\\{label}.folded in the collapsed format read by
+    flamegraph.pl and speedscope. Overhead is a fixed cost per sample rather than per
+    call, so it can stay on for full-size runs where cProfile would distort timings.
+    """
+
+    def __init__(self, output_path: str, interval: float = 0.005):
+        self.output_path = output_path
+        self.interval = interval
+
+    @contextmanager
+    def __call__(self, label: str):
+
+        thread_id = threading.get_ident()
+        samples = Counter()
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                frame = sys._current_frames().get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                samples[';'.join(reversed(stack))] += 1
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+
+        try:
+            yield
+        finally:
+            done.set()
+            sampler.join()
+            os.makedirs(self.output_path, exist_ok=True)
+            with open(fr"{self.output_path}\{label}.folded", 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+
+PROFILERS = {'cprofile': CProfileHook, 'sampling': SamplingProfilerHook}
+
+class RunReport:
+
+    """Structured record of one Pipeline run, saved as reports\\run_report.json.
+
+    stage() times a block and, with track_memory, records its tracemalloc peak. Stages
+    can be tagged with an area. Per-area load times with rows and bytes read per table,
+    sheets and cells written per output file, area and chart cache counters and every error are
+    collected alongside. profiler is 'cprofile', 'sampling' or any callable that takes a
+    stage label and returns a context manager; profile_stages limits it to those stage
+    names. str() gives the old one-line pipeline status.
+    """
+
+    def __init__(self, folder_path: str, areas: list, track_memory: bool = False, profiler = None, profile_stages: list = None):
+        self.folder_path = folder_path
+        self.report_path = fr"{folder_path}\reports\run_report.json"
+        self.areas = areas
+        self.track_memory = track_memory
+        self.profile_stages = profile_stages
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.seconds = None
+        self.stages = []
+        self.area_stats = {}
+        self.outputs = {}
+        self.cache = {}
+        self.chart_cache = {}
+        self.errors = []
+        self._start = perf_counter()
+
+        if isinstance(profiler, str):
+            profiler = PROFILERS[profiler](fr"{folder_path}\reports\profiles")
+
+        self.profiler = profiler
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.errors
+
+    @contextmanager
+    def stage(self, name: str, area: str = None):
+
+        record = {'stage': name, 'area': area, 'status': 'ok', 'seconds': None, 'peak_bytes': None}
+
+        # A stage nested inside a traced stage is timed but its memory is counted by the outer one
+
+        tracing = self.track_memory and not tracemalloc.is_tracing()
+
+        if tracing:
+            tracemalloc.start()
+
+        label = name if area is None else f"{name}_{area}"
+
+        profiling = self.profiler is not None and (self.profile_stages is None or name in self.profile_stages)
+
+        start = perf_counter()
+
+        try:
+            with self.profiler(label) if profiling else nullcontext():
+                yield record
+        except Exception as e:
+            self.fail(record, str(e))
+            raise
+        finally:
+            record['seconds'] = perf_counter() - start
+            if tracing:
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.stages.append(record)
+
+    def mark(self, name: str, status: str):
+
+        # Stages the scheduler did not run, because they were resumed from a checkpoint or skipped
+
+        self.stages.append({'stage': name, 'area': None, 'status': status, 'seconds': 0.0, 'peak_bytes': None})
+
+    def fail(self, record: dict, error: str):
+        record['status'] = 'error'
+        record['error'] = error
+        self.errors.append({'stage': record['stage'], 'area': record['area'], 'error': error})
+
+    def check(self, record: dict, message):
+
+        # The writers, formatters and chart builder report failures as step strings instead of raising
+
+        if isinstance(message, str) and '❌' in message:
+            self.fail(record, message)
+
+    def add_area(self, area: str, load_stats: dict, reused: bool = False):
+
+        tables = load_stats.get('tables', {})
+
+        self.area_stats[area] = {
+            'reused': reused,
+            'load_seconds': load_stats.get('seconds'),
+            'rows': sum(table['rows'] for table in tables.values()),
+            'bytes': sum(table['bytes'] for table in tables.values()),
+            'tables': tables,
+        }
+
+    def add_output(self, file_path: str, writer):
+        self.outputs[file_path] = {'sheets': writer.sheets_written, 'cells': writer.cells_written}
+
+    def to_dict(self) -> dict:
+        return {
+            'started': self.started,
+            'seconds': self.seconds,
+            'succeeded': self.succeeded,
+            'areas': self.areas,
+            'stages': self.stages,
+            'area_stats': self.area_stats,
+            'outputs': self.outputs,
+            'cache': self.cache,
+            'chart_cache': self.chart_cache,
+            'errors': self.errors,
+        }
+
+    def save(self) -> str:
+
+        self.seconds = perf_counter() - self._start
+
+        os.makedirs(fr"{self.folder_path}\reports", exist_ok=True)
+
+        with open(f"{self.report_path}.tmp", 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+        os.replace(f"{self.report_path}.tmp", self.report_path)
+
+        return self.report_path
+
+    def __str__(self) -> str:
+
+        if self.succeeded:
+            return "Pipeline completed without errors"
+
+        return f"❌ Pipeline failed with errors in: {', '.join(error['stage'] for error in self.errors)}"
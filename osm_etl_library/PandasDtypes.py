@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# Functions reproducing the dtypes pandas gives columns it never built, for the backends
+# that compute statistics without the area frame (Arrow tables, SQLite rows, shared frames)
+
+def pandas_dtype(column) -> tuple:
+
+    # The dtype pandas.read_csv gives this column, and whether the column is entirely empty
+
+    import pyarrow as pa
+
+    all_na = column.null_count == len(column)
+
+    if pa.types.is_null(column.type) or pa.types.is_floating(column.type):
+        return 'float64', all_na
+
+    if pa.types.is_integer(column.type):
+        return ('int64' if column.null_count == 0 else 'float64'), all_na
+
+    if pa.types.is_boolean(column.type):
+        return ('bool' if column.null_count == 0 else 'object'), all_na
+
+    return 'str', all_na
+
+def dtype_proxy(dtype, all_na: bool = False, size: int = 1) -> pd.Series:
+
+    # One-value stand-in of a column, so pandas itself resolves the dtype of a concat
+
+    if size == 0:
+        return pd.Series(dtype=dtype)
+
+    value = {'int64': 0, 'float64': np.nan if all_na else 0.5, 'bool': True, 'object': True, 'str': 'a'}.get(str(dtype), 'a')
+
+    return pd.Series([value], dtype=dtype)
+
+def cast_value(value, dtype):
+
+    # What a value becomes when pandas upcasts its column to dtype
+
+    dtype = str(dtype)
+
+    if dtype == 'float64':
+        return float(value)
+    if dtype == 'int64':
+        return int(value)
+    if dtype == 'bool':
+        return bool(value)
+
+    return value
@@ -1,83 +1,339 @@
+import os
+from .DataCache import AreaDataCache, DEFAULT_CACHE_MAX_BYTES
 from .FolderCreator import AttributionFolderCreator, ChartFolderCreator, FolderCreatorPipeline
-from .DataTransformer import TransformPipelineReport, TransformPipelineCharts
-from .ChartCreator import ChartBuilderPipeline
-from .ExcelWriter import ExcelWriter
-from .ExcelFormatter import ExcelFormatterPipeline
+from .Instrumentation import RunReport
+from .StageScheduler import Stage, StageCheckpoints, StageScheduler, run_version
+
+# Stage modules are imported inside run(), when their stage starts, so openpyxl and
+# matplotlib are not loaded before they are needed
+
+# Stage selections that name a branch of the graph rather than single stages
+
+STAGE_GROUPS = {'reports': ['write_report', 'format_report'], 'charts': ['write_charts', 'insert_charts']}
 
 class Pipeline:
-    def __init__(self, folder_path: str, areas: list):
+    def __init__(self, folder_path: str, areas: list, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES, columnar_cache: bool = False, chunksize: int = None, workers: int = None, save_chart_pngs: bool = True, streaming_writer: bool = False, single_pass_formatter: bool = False, project_columns: bool = False, compact_dtypes: bool = False, incremental: bool = False, sparse_tags: bool = False, concurrent_tables: bool = False, source: str = 'csv', backend: str = 'pandas', previous_folder_path: str = None, completeness_keys: list = None, chart_cache: bool = False, chart_cache_max_bytes: int = None, values_top_n: int = None, values_spill: str = None, stages: list = None, resume: bool = False, checkpoints: bool = True, stage_workers: int = 2, track_memory: bool = False, profiler = None, profile_stages: list = None, backend_workers: int = None):
         self.folder_path = folder_path
         self.areas = areas
+        self.cache_max_bytes = cache_max_bytes
+        self.columnar_cache = columnar_cache
+        self.chunksize = chunksize
+        self.workers = workers
+        self.save_chart_pngs = save_chart_pngs
+        self.streaming_writer = streaming_writer
+        self.single_pass_formatter = single_pass_formatter
+        self.project_columns = project_columns
+        self.compact_dtypes = compact_dtypes
+        self.incremental = incremental
+        self.sparse_tags = sparse_tags
+        self.concurrent_tables = concurrent_tables
+        self.source = source
+        self.backend = backend
+        self.previous_folder_path = previous_folder_path
+        self.completeness_keys = completeness_keys
+        self.chart_cache = chart_cache
+        self.chart_cache_max_bytes = chart_cache_max_bytes
+        self.values_top_n = values_top_n
+        self.values_spill = values_spill
+        self.stages = stages
+        self.resume = resume
+        self.checkpoints = checkpoints
+        self.stage_workers = stage_workers
+        self.track_memory = track_memory
+        self.profiler = profiler
+        self.profile_stages = profile_stages
+        self.backend_workers = backend_workers
         # self.folders = folders
 
-    def run(self):
+    def stage_graph(self, report: RunReport, cache: AreaDataCache, loader_options: dict, values_options: dict, chart_cache) -> list:
 
-        # Create folders for reports and charts
+        # The area cache is only used by transform and insert_charts, and insert_charts depends
+        # on transform, so stages that run concurrently never share it
 
-        try:
+        data_report = fr"{self.folder_path}\reports\osm_data_report.xlsx"
+        formatted_report = fr"{self.folder_path}\reports\osm_data_report_formatted.xlsx"
+        chart_report = fr"{self.folder_path}\reports\osm_category_charts.xlsx"
+
+        def create_folders(inputs: dict, record: dict):
+
+            print("Creating folders for reports and charts...")
+
+            folder_creators = [AttributionFolderCreator(self.folder_path), ChartFolderCreator(self.folder_path, self.areas)]
+
+            FolderCreatorPipeline(folder_creators).create_folders()
+
+            print("✅ Folders created successfully.")
+
+        def index_areas(inputs: dict, record: dict):
+
+            # The SQLite backend ingests changed areas into its index once, before any worker reads it
+
+            from .AreaIndex import AreaIndex
+
+            index = AreaIndex(self.folder_path, loader_options=loader_options)
+
+            for area in self.areas:
+                try:
+                    with report.stage('index_area', area):
+                        index.ensure(area)
+                except Exception as e:
+                    print(f"❌ Error indexing {area}: {e}")
+
+        def transform(inputs: dict, record: dict) -> dict:
+
+            print("Generating dataframes for reports and charts...")
+
+            if self.workers or self.incremental:
+
+                from .AreaProcessor import ParallelAreaRunner
+                from .RunManifest import RunManifest
+
+                # Each area is loaded, transformed and charted on its own, in a worker process when
+                # workers is set; incremental runs reuse fragments of areas whose inputs are unchanged
+
+                manifest = RunManifest(self.folder_path, {'chunksize': self.chunksize, 'loader_options': loader_options, 'backend': self.backend, 'completeness_keys': self.completeness_keys, 'values_options': values_options}) if self.incremental else None
+
+                runner = ParallelAreaRunner(self.folder_path, self.areas, self.workers or 1, self.chunksize, self.cache_max_bytes, loader_options, manifest, self.backend, self.completeness_keys, self.chart_cache, self.chart_cache_max_bytes, values_options, self.backend_workers)
+
+                excel_dict, excel_dict_charts, chart_images = runner.run_transforms()
+
+                for area, stats in runner.area_stats.items():
+                    report.add_area(area, stats['load_stats'], stats['reused'])
+                    report.area_stats[area]['timings'] = stats['timings']
+
+                for area, e in runner.errors.items():
+                    report.errors.append({'stage': 'process_areas', 'area': area, 'error': str(e)})
+
+                if chart_cache is not None:
+                    chart_cache.add_counts(runner.chart_cache_counts)
+
+                areas = list(chart_images)
+
+            else:
+
+                from .DataTransformer import TransformPipelineReport, TransformPipelineCharts
+
+                # Loading every area up front gives per-area timings; the transforms then hit the cache
+
+                for area in self.areas:
+                    try:
+                        with report.stage('load_area', area):
+                            cache.get_statistics(area, self.chunksize)
+                    except Exception as e:
+                        print(f"❌ Error loading {area}: {e}")
+                    report.add_area(area, cache.load_stats.get(area, {}))
+
+                excel_dict = TransformPipelineReport(self.folder_path, self.areas, cache, self.chunksize, self.completeness_keys, values_options).run_transforms()
+
+                excel_dict_charts = TransformPipelineCharts(self.folder_path, self.areas, cache, self.chunksize).run_transforms()
+
+                chart_images = {}
+
+                areas = self.areas
+
+            print("✅ Dataframes generated successfully.")
+
+            return {'report': excel_dict, 'charts': excel_dict_charts, 'chart_images': chart_images, 'areas': areas}
+
+        def snapshot_diff(inputs: dict, record: dict) -> dict:
+
+            # Diff mode: changes since the previous export become extra sheets of the data report
+
+            from .SnapshotDiff import SnapshotDiffPipeline
+
+            return SnapshotDiffPipeline(self.previous_folder_path, self.folder_path, self.areas, loader_options).run_transforms()
+
+        def write_report(inputs: dict, record: dict) -> str:
+
+            print("Writing the data report...")
+
+            from .ExcelWriter import ExcelWriter, StreamingExcelWriter
+
+            excel_dict = dict(inputs['transform']['report'])
+
+            if 'snapshot_diff' in inputs:
+                excel_dict.update(inputs['snapshot_diff'])
+
+            if self.streaming_writer:
+
+                # Writes the formatted report directly, so there is no separate formatting pass
+
+                writer = StreamingExcelWriter(excel_dict, formatted_report)
+
+            else:
+
+                writer = ExcelWriter(excel_dict, data_report)
 
-            try:
+            report.check(record, writer.write_dataframes())
+            report.add_output(writer.folder_path, writer)
 
-                print("Creating folders for reports and charts...")
+            return writer.folder_path
 
-                folder_creators = [AttributionFolderCreator(self.folder_path), ChartFolderCreator(self.folder_path, self.areas)]
+        def format_report(inputs: dict, record: dict) -> str:
 
-                FolderCreatorPipeline(folder_creators).create_folders()
+            print("Formatting the data report...")
 
-                print("✅ Folders created successfully.")
-            
-            except Exception as e:
+            from .ExcelFormatter import ExcelFormatterPipeline, SinglePassExcelFormatter
 
-                print(f"❌ Error creating folders: {e}")
+            if self.single_pass_formatter:
+                formatter = SinglePassExcelFormatter(inputs['write_report'])
+                report.check(record, formatter.format_excel())
+                record['timings'] = formatter.timings
+            else:
+                report.check(record, ExcelFormatterPipeline(inputs['write_report']).format_excel())
 
-            # Generate reports and charts
+            return formatted_report
 
-            try:
+        def write_charts(inputs: dict, record: dict) -> str:
 
-                print("Generating dataframes for reports and charts...")
+            print("Writing the chart workbook...")
 
-                excel_dict = TransformPipelineReport(self.folder_path, self.areas).run_transforms()
+            from .ExcelWriter import ExcelWriter
 
-                excel_dict_charts = TransformPipelineCharts(self.folder_path, self.areas).run_transforms()
+            writer = ExcelWriter(inputs['transform']['charts'], chart_report)
 
-                print("✅ Dataframes generated successfully.")
+            report.check(record, writer.write_dataframes())
+            report.add_output(writer.folder_path, writer)
 
-            except Exception as e:
+            return writer.folder_path
 
-                print(f"❌ Error generating dataframes: {e}")
+        def insert_charts(inputs: dict, record: dict) -> str:
 
-            try:
+            print("Adding charts to the chart workbook...")
 
-                print("Writing dataframes to Excel files...")
-        
-                ExcelWriter(excel_dict, fr"{self.folder_path}\reports\osm_data_report.xlsx").write_dataframes()
+            from .ChartCreator import ChartBuilderPipeline
 
-                ExcelWriter(excel_dict_charts, fr"{self.folder_path}\reports\osm_category_charts.xlsx").write_dataframes()
+            transformed = inputs['transform']
 
-                print("✅ Excel files created successfully.")
-            
-            except Exception as e:
+            report.check(record, ChartBuilderPipeline(self.folder_path, transformed['areas'], cache, self.chunksize, transformed['chart_images'], self.workers, self.save_chart_pngs, chart_cache).run_transforms())
 
-                print(f"❌ Error writing dataframes to Excel files: {e}")
-            
-            try:
-                print("Formatting Excel files...")
+            return inputs['write_charts']
 
-                ChartBuilderPipeline(self.folder_path, self.areas).run_transforms()
+        files = lambda path: [path]
 
-                ExcelFormatterPipeline(fr"{self.folder_path}\reports\osm_data_report.xlsx").format_excel()
+        stages = [
+            Stage('create_folders', create_folders, checkpoint=False),
+            Stage('transform', transform, ['index_areas'] if self.backend == 'sqlite' else []),
+            Stage('write_report', write_report, ['create_folders', 'transform'] + (['snapshot_diff'] if self.previous_folder_path is not None else []), files),
+            Stage('write_charts', write_charts, ['create_folders', 'transform'], files),
+            Stage('insert_charts', insert_charts, ['write_charts', 'transform'], files),
+        ]
 
-                print("✅ Excel files formatted successfully.")
-   
-            except Exception as e:
+        if self.backend == 'sqlite':
+            stages.append(Stage('index_areas', index_areas, checkpoint=False))
+
+        if self.previous_folder_path is not None:
+            stages.append(Stage('snapshot_diff', snapshot_diff))
+
+        if not self.streaming_writer:
+            stages.append(Stage('format_report', format_report, ['write_report'], files))
+
+        return stages
+
+    def run_version(self, loader_options: dict, values_options: dict) -> str:
+
+        # Checkpoints hold for the same package source, configuration and input files (by size and mtime)
+
+        from .DataLoader import make_loader
+        from .RunManifest import code_version
+
+        stamps = {}
+
+        for folder_path in (self.folder_path, self.previous_folder_path):
+
+            if folder_path is None:
+                continue
+
+            for area in self.areas:
+                for source_path in make_loader(folder_path, area, **loader_options).source_files():
+                    try:
+                        stat = os.stat(source_path)
+                    except FileNotFoundError:
+                        continue
+                    stamps[source_path] = [stat.st_size, stat.st_mtime_ns]
+
+        config = {'areas': self.areas, 'chunksize': self.chunksize, 'loader_options': loader_options, 'backend': self.backend, 'completeness_keys': self.completeness_keys, 'values_options': values_options, 'previous_folder_path': self.previous_folder_path, 'streaming_writer': self.streaming_writer, 'single_pass_formatter': self.single_pass_formatter, 'save_chart_pngs': self.save_chart_pngs}
+
+        return run_version(code_version(), config, stamps)
+
+    def targets(self, stages: list) -> list:
+
+        # Expands stage groups such as 'reports' and drops stages this configuration does not have
+
+        if self.stages is None:
+            return None
+
+        names = {stage.name for stage in stages}
+
+        targets = []
+
+        for name in self.stages:
+            if name in STAGE_GROUPS:
+                targets.extend(stage for stage in STAGE_GROUPS[name] if stage in names)
+            else:
+                targets.append(name)
+
+        return targets
+
+    def run(self) -> RunReport:
+
+        # Returns the run report, which is also saved as reports\run_report.json
+
+        report = RunReport(self.folder_path, self.areas, self.track_memory, self.profiler, self.profile_stages)
+
+        # Share one area cache across every stage so each area is loaded once per run
+
+        loader_options = {'columnar_cache': self.columnar_cache, 'columns': 'auto' if self.project_columns else None, 'compact': self.compact_dtypes, 'representation': 'sparse' if self.sparse_tags else 'dense', 'concurrent_tables': self.concurrent_tables, 'source': self.source}
+
+        cache = AreaDataCache(self.folder_path, self.cache_max_bytes, loader_options, self.backend, self.completeness_keys, self.backend_workers)
+
+        values_options = {'top_n': self.values_top_n, 'spill': self.values_spill}
+
+        chart_cache = None
+
+        if self.chart_cache:
+
+            from .ChartCreator import ChartImageCache
+
+            chart_cache = ChartImageCache(self.folder_path, self.chart_cache_max_bytes)
+
+        try:
+
+            stages = self.stage_graph(report, cache, loader_options, values_options, chart_cache)
+
+            checkpoints = StageCheckpoints(self.folder_path, self.run_version(loader_options, values_options)) if self.checkpoints or self.resume else None
+
+            # Memory tracing and profiling are per process and per thread, so traced runs keep stages sequential
+
+            workers = 1 if self.track_memory or self.profiler is not None else self.stage_workers
+
+            StageScheduler(stages, report, checkpoints, workers, self.resume).run(self.targets(stages))
+
+            info = cache.cache_info()
+
+            print(f"Area cache: {info['hits']} hits, {info['misses']} misses, {info['evictions']} evictions.")
+
+            report.cache = info
+
+            if chart_cache is not None:
+
+                info = chart_cache.cache_info()
+
+                hit_rate = f"{info['hit_rate']:.0%}" if info['hit_rate'] is not None else 'n/a'
+
+                print(f"Chart cache: {info['hits']} hits, {info['misses']} misses ({hit_rate} hit rate), {info['evictions']} evictions.")
+
+                report.chart_cache = info
+
+            cache.clear()
 
-                print(f"❌ Error formatting Excel files: {e}")
-        
-            return "Pipeline completed without errors" 
-    
         except Exception as e:
             print(f"❌ An error occurred in the pipeline: {e}")
-            return f"❌ Pipeline failed with error: {e}"
+            report.errors.append({'stage': 'pipeline', 'area': None, 'error': str(e)})
+
+        try:
+            print(f"Run report written to {report.save()}")
+        except Exception as e:
+            print(f"❌ Error writing run report: {e}")
 
-        # Formatting the Excel files
-        
\ No newline at end of file
+        return report
@@ -0,0 +1,113 @@
+import os
+import json
+import glob
+import hashlib
+import pandas as pd
+from .DataLoader import ColumnarTableCache, make_loader
+
+# Classes for incremental runs
+
+def code_version() -> str:
+
+    # Hash of the package source, so any code change invalidates every stored fragment
+
+    digest = hashlib.sha256()
+
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+class RunManifest:
+
+    """Manifest of a previous run and its per-area report fragments, kept under reports/.
+
+    For every area the manifest records the size, mtime and SHA-256 of each input file
+    together with a version made of the package source hash and the run configuration.
+    Each area's computed sheets and chart images are stored as a pickled fragment. An
+    area whose inputs and version are unchanged is assembled from its fragment instead
+    of being recomputed; a file whose mtime moved but whose content hash matches still
+    counts as unchanged.
+    """
+
+    def __init__(self, folder_path: str, config: dict = None):
+        self.folder_path = folder_path
+        self.manifest_path = fr"{folder_path}\reports\run_manifest.json"
+        self.fragment_path = fr"{folder_path}\reports\fragments"
+        self.loader_options = (config or {}).get('loader_options') or {}
+        self.version = hashlib.sha256(f"{code_version()}:{json.dumps(config or {}, sort_keys=True, default=str)}".encode()).hexdigest()
+        self.entries = {}
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.version:
+                self.entries = manifest.get('areas', {})
+
+    def fingerprint(self, area: str, previous: dict = None) -> dict:
+
+        previous = previous or {}
+
+        fingerprint = {}
+
+        for source_path in make_loader(self.folder_path, area, **self.loader_options).source_files():
+
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                continue
+
+            known = previous.get(source_path)
+
+            # Only hash a file when size and mtime alone cannot prove it unchanged
+
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                sha256 = known['sha256']
+            else:
+                sha256 = ColumnarTableCache.file_hash(source_path)
+
+            fingerprint[source_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+
+        return fingerprint
+
+    def fragment_file(self, area: str) -> str:
+        return fr"{self.fragment_path}\{area}.pkl"
+
+    def is_current(self, area: str) -> bool:
+
+        entry = self.entries.get(area)
+
+        if entry is None or not os.path.exists(self.fragment_file(area)):
+            return False
+
+        fingerprint = self.fingerprint(area, entry['tables'])
+
+        unchanged = {table: value['sha256'] for table, value in fingerprint.items()} == {table: value['sha256'] for table, value in entry['tables'].items()}
+
+        if unchanged:
+            entry['tables'] = fingerprint
+
+        return unchanged
+
+    def load_fragment(self, area: str) -> dict:
+        return pd.read_pickle(self.fragment_file(area))
+
+    def save_fragment(self, area: str, result: dict, fingerprint: dict):
+
+        # fingerprint is taken before the area is processed, so a table that changes
+        # mid-run is picked up again next time
+
+        os.makedirs(self.fragment_path, exist_ok=True)
+
+        pd.to_pickle(result, f"{self.fragment_file(area)}.tmp")
+        os.replace(f"{self.fragment_file(area)}.tmp", self.fragment_file(area))
+
+        self.entries[area] = {'tables': fingerprint}
+
+    def save(self):
+
+        with open(f"{self.manifest_path}.tmp", 'w') as f:
+            json.dump({'version': self.version, 'areas': self.entries}, f, indent=2)
+
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
@@ -0,0 +1,107 @@
+import os
+import json
+import pickle
+import shutil
+import weakref
+import tempfile
+import pandas as pd
+
+# Classes for sharing area frames between processes without copying them
+
+DTYPES_METADATA_KEY = b'osm_etl_dtypes'
+
+def shared_directory() -> str:
+
+    # /dev/shm keeps the files in memory on Linux; elsewhere the OS page cache is shared instead
+
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+class SharedFrameStore:
+
+    """Run-scoped store of area frames published as memory-mapped Arrow IPC files.
+
+    publish() writes a frame once, uncompressed, to a private directory (in /dev/shm
+    where available) and returns a small picklable handle. attach_frame() maps that file
+    in another process and builds a frame over the mapped buffers, reading only the
+    requested columns, so workers share one copy of the data instead of unpickling their
+    own. Column dtypes are kept in the file's metadata and restored on attach; object
+    columns that Arrow cannot type (mixed values) are stored pickled alongside and are
+    the only columns a worker copies.
+
+    The directory is removed by close(), and in any case when the store is garbage
+    collected or the interpreter exits.
+    """
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix='osm_etl_shared_', dir=shared_directory())
+        self.handles = {}
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def publish(self, name: str, df: pd.DataFrame) -> dict:
+
+        import pyarrow as pa
+
+        if name in self.handles:
+            return self.handles[name]
+
+        arrays = {}
+        objects = {}
+
+        for column in df.columns:
+            try:
+                arrays[column] = pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                objects[column] = df[column]
+
+        dtypes = {column: str(df[column].dtype) for column in df.columns}
+
+        table = pa.table(arrays).replace_schema_metadata({DTYPES_METADATA_KEY: json.dumps({'dtypes': dtypes, 'columns': list(df.columns)})})
+
+        path = os.path.join(self.directory, f"{len(self.handles):05d}.arrow")
+
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        objects_path = None
+
+        if objects:
+            objects_path = f"{path}.objects.pkl"
+            with open(objects_path, 'wb') as f:
+                pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.handles[name] = {'path': path, 'objects_path': objects_path}
+
+        return self.handles[name]
+
+    def close(self):
+        self.handles.clear()
+        self._finalizer()
+
+def attach_frame(handle: dict, columns: list = None) -> pd.DataFrame:
+
+    import pyarrow as pa
+
+    # The mapping stays open for as long as the frame's buffers reference it
+
+    table = pa.ipc.open_file(pa.memory_map(handle['path'])).read_all()
+
+    meta = json.loads(table.schema.metadata[DTYPES_METADATA_KEY])
+
+    wanted = [column for column in meta['columns'] if columns is None or column in columns]
+
+    # split_blocks lets numeric columns without nulls and Arrow-backed strings stay views of the mapping
+
+    df = table.select([column for column in wanted if column in table.column_names]).to_pandas(split_blocks=True)
+
+    if handle['objects_path'] is not None and any(column not in table.column_names for column in wanted):
+        with open(handle['objects_path'], 'rb') as f:
+            objects = pickle.load(f)
+        for column in wanted:
+            if column in objects:
+                df[column] = objects[column].to_numpy()
+
+    for column in df.columns:
+        if str(df[column].dtype) != meta['dtypes'][column]:
+            df[column] = df[column].astype(meta['dtypes'][column])
+
+    return df[wanted]
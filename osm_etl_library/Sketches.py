@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Classes for fixed-memory, mergeable summaries of value streams
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+
+    # Bit length of uint64 values, split into 32-bit halves that float64 represents exactly
+
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+
+    with np.errstate(divide='ignore'):
+        high_length = np.where(high > 0, np.floor(np.log2(high)) + 33, 0)
+        low_length = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+
+    return np.where(high > 0, high_length, low_length).astype(np.int64)
+
+class HyperLogLog:
+
+    """Distinct-value estimate in 2**precision one-byte registers.
+
+    Values are hashed to 64 bits; the first precision bits pick a register, which keeps
+    the largest position of the first set bit seen in the remaining bits. The relative
+    standard error of estimate() is 1.04 / sqrt(2**precision), 0.81% with the default
+    precision of 14 (16 KB per sketch); small cardinalities use linear counting and are
+    close to exact. Sketches of the same precision merge by taking register maxima, so
+    chunks, tables and areas combine with no loss beyond that of a single sketch.
+    """
+
+    def __init__(self, precision: int = 14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+
+        values = np.asarray(values, dtype=object)
+
+        if len(values) == 0:
+            return self
+
+        hashes = pd.util.hash_array(values, categorize=False)
+
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+
+        # A guard bit below the used bits bounds the rank at 64 - precision + 1
+
+        rest = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        rank = (65 - _bit_length(rest)).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+
+        return self
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+        return self
+
+    def estimate(self) -> int:
+
+        m = len(self.registers)
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+
+        return int(round(estimate))
+
+def heavy_hitters(counts: pd.Series, capacity: int) -> tuple:
+
+    # Misra-Gries reduction: subtracting the (capacity + 1)-th largest count from every
+    # counter leaves at most capacity positive ones. Returns the kept counts and the
+    # amount subtracted, which bounds how far any kept count is below its true count
+
+    if len(counts) <= capacity:
+        return counts, 0
+
+    threshold = int(np.partition(counts.to_numpy(), len(counts) - capacity - 1)[len(counts) - capacity - 1])
+
+    counts = counts - threshold
+
+    return counts[counts > 0], threshold
@@ -0,0 +1,290 @@
+import os
+import copy
+import pickle
+import numpy as np
+import pandas as pd
+from .DataAggregator import AreaStatistics
+from .DataLoader import make_loader, SOURCE_COLUMN
+from .RunManifest import code_version
+
+# Classes for comparing two exports of the same areas
+
+COMPLETENESS_LABELS = {'name': 'Name Completeness', 'name:en': 'Name Completeness (eng)', 'addr:street': 'Address Completeness (Street)'}
+
+def normalise(column: pd.Series) -> pd.Series:
+
+    # Text form of a column, so a value hashes the same whether an export read it as int, float or str
+
+    if pd.api.types.is_float_dtype(column.dtype):
+        values = column.dropna()
+        if len(values) == 0 or (values % 1 == 0).all():
+            column = column.astype('Int64')
+
+    return column.astype('str')
+
+class SnapshotDiff:
+
+    """Changes of one area between a previous and a current export.
+
+    Both exports are loaded as frames and every row is reduced to a 64-bit fingerprint
+    of its tags, hashed over the union of both exports' columns in text form. Rows are
+    joined on their source and key through the fingerprint indexes alone. OSM ids are
+    only unique per element type, so the source is the row's table for CSV exports and
+    its element type for .osm extracts, and repeated keys are told apart by their
+    occurrence. A row without a key is matched on its fingerprint, so it is unchanged or
+    else removed and added. Keys only in the current export are added, keys only in the
+    previous export are removed and keys whose fingerprints differ are modified.
+
+    Both exports are still loaded, as the join needs every row's fingerprint, but only
+    the changed rows are aggregated: the previous export's AreaStatistics are updated by
+    merging the statistics of the added and modified rows and subtracting those of the
+    removed and the previous versions of the modified rows. The statistics of each
+    export are kept in its reports\\statistics\\{area}.pkl, tied to the size and mtime of
+    its source files and to the package source, so diffing against an export that was
+    itself the current side of an earlier diff reuses them; otherwise they are computed
+    from the previous export once and stored for next time. reused_previous tells which
+    case applied.
+    """
+
+    def __init__(self, previous_folder_path: str, folder_path: str, area: str, loader_options: dict = None, key: str = 'osm_id'):
+        self.previous_folder_path = previous_folder_path
+        self.folder_path = folder_path
+        self.area = area
+        self.loader_options = dict(loader_options or {}, columns=None, compact=False, representation='dense', sources=True)
+        self.key = key
+        self.added = None
+        self.removed = None
+        self.modified = None
+        self.previous = None
+        self.current = None
+        self.incoming = None
+        self.outgoing = None
+        self.feature_changes = None
+        self.reused_previous = False
+
+    def load(self, folder_path: str) -> tuple:
+
+        # The source column only keys the join; the frame aggregates as any other load does
+
+        df = make_loader(folder_path, self.area, **self.loader_options).load_dataframes()
+
+        if SOURCE_COLUMN not in df.columns:
+            return df, pd.Series(dtype='str', index=df.index)
+
+        return df, df.pop(SOURCE_COLUMN).astype('str')
+
+    def fingerprints(self, df: pd.DataFrame, sources: pd.Series, columns: list) -> pd.Series:
+
+        aligned = pd.DataFrame({column: normalise(df[column]) if column in df.columns else pd.Series(np.nan, index=df.index, dtype='str') for column in columns})
+
+        hashes = pd.util.hash_pandas_object(aligned, index=False)
+
+        keys = normalise(df[self.key]) if self.key in df.columns else pd.Series(np.nan, index=df.index, dtype='str')
+
+        # OSM ids are numbers, so a fingerprint key never meets a real one
+
+        keys = keys.mask(keys.isna(), '#' + hashes.astype('str'))
+
+        occurrence = pd.DataFrame({'source': sources, 'key': keys}).groupby(['source', 'key'], sort=False).cumcount()
+
+        return pd.Series(hashes.to_numpy(), index=pd.MultiIndex.from_arrays([sources.to_numpy(), keys.to_numpy(), occurrence.to_numpy()]))
+
+    def statistics_file(self, folder_path: str) -> str:
+        return fr"{folder_path}\reports\statistics\{self.area}.pkl"
+
+    def source_stamps(self, folder_path: str) -> dict:
+
+        stamps = {}
+
+        for source_path in make_loader(folder_path, self.area, **self.loader_options).source_files():
+            try:
+                stat = os.stat(source_path)
+            except FileNotFoundError:
+                continue
+            stamps[source_path] = [stat.st_size, stat.st_mtime_ns]
+
+        return stamps
+
+    def load_statistics(self, folder_path: str) -> AreaStatistics:
+
+        try:
+            with open(self.statistics_file(folder_path), 'rb') as f:
+                stored = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        if stored.get('version') != code_version() or stored.get('stamps') != self.source_stamps(folder_path):
+            return None
+
+        return stored['statistics']
+
+    def save_statistics(self, folder_path: str, stats: AreaStatistics):
+
+        # A read-only snapshot folder only means the statistics are computed again next time
+
+        try:
+            os.makedirs(fr"{folder_path}\reports\statistics", exist_ok=True)
+            with open(f"{self.statistics_file(folder_path)}.tmp", 'wb') as f:
+                pickle.dump({'version': code_version(), 'stamps': self.source_stamps(folder_path), 'statistics': stats}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{self.statistics_file(folder_path)}.tmp", self.statistics_file(folder_path))
+        except OSError as e:
+            print(f"step: snapshot_diff, ❌ Could not store statistics of {self.area} in {folder_path}: {e}")
+
+    @staticmethod
+    def statistics(df: pd.DataFrame, features: list, attributes: list) -> AreaStatistics:
+
+        stats = AreaStatistics(features, attributes)
+
+        if len(df):
+            stats.update(df)
+
+        return stats
+
+    def run(self) -> 'SnapshotDiff':
+
+        previous_df, previous_sources = self.load(self.previous_folder_path)
+        current_df, current_sources = self.load(self.folder_path)
+
+        # unknown is derived from feature_type, so it carries no change of its own
+
+        columns = sorted((set(previous_df.columns) | set(current_df.columns)) - {self.key, 'unknown'})
+
+        previous_fp = self.fingerprints(previous_df, previous_sources, columns)
+        current_fp = self.fingerprints(current_df, current_sources, columns)
+
+        common = previous_fp.index.intersection(current_fp.index, sort=False)
+
+        changed = previous_fp.loc[common].to_numpy() != current_fp.loc[common].to_numpy()
+
+        self.added = current_fp.index.difference(previous_fp.index, sort=False)
+        self.removed = previous_fp.index.difference(current_fp.index, sort=False)
+        self.modified = common[changed]
+
+        previous_rows = previous_fp.index.isin(self.removed) | previous_fp.index.isin(self.modified)
+        current_rows = current_fp.index.isin(self.added) | current_fp.index.isin(self.modified)
+
+        # Features and attributes of both exports, so every delta lines up
+
+        self.previous = self.load_statistics(self.previous_folder_path)
+
+        self.reused_previous = self.previous is not None
+
+        if self.previous is None:
+            self.previous = AreaStatistics.from_frame(previous_df)
+            self.save_statistics(self.previous_folder_path, self.previous)
+
+        features = list(pd.unique(pd.Series(list(previous_df['feature_type'].unique()) + list(current_df['feature_type'].unique()), dtype=object)))
+        attributes = [feature for feature in features if feature in previous_df.columns or feature in current_df.columns]
+
+        self.outgoing = self.statistics(previous_df[previous_rows], features, attributes)
+        self.incoming = self.statistics(current_df[current_rows], features, attributes)
+
+        self.current = copy.deepcopy(self.previous).merge(self.incoming).subtract(self.outgoing)
+
+        self.save_statistics(self.folder_path, self.current)
+
+        self.feature_changes = pd.DataFrame({
+            'Added': current_df.loc[current_fp.index.isin(self.added), 'feature_type'].value_counts(dropna=False),
+            'Removed': previous_df.loc[previous_fp.index.isin(self.removed), 'feature_type'].value_counts(dropna=False),
+            'Modified': current_df.loc[current_fp.index.isin(self.modified), 'feature_type'].value_counts(dropna=False),
+        }).reindex(features).fillna(0).astype('int64')
+
+        return self
+
+    def changes_report(self) -> pd.DataFrame:
+
+        report = self.feature_changes.rename_axis('Feature Type').reset_index()
+
+        total = pd.DataFrame({'Feature Type': ['Total'], 'Added': [len(self.added)], 'Removed': [len(self.removed)], 'Modified': [len(self.modified)]})
+
+        return pd.concat([report, total], ignore_index=True)
+
+    def completeness_delta(self) -> pd.DataFrame:
+
+        data = {'Area of Interest': [self.area], 'Previous Row Count': [self.previous.row_count], 'Row Count': [self.current.row_count], 'Row Count Change': [self.current.row_count - self.previous.row_count]}
+
+        for key, label in COMPLETENESS_LABELS.items():
+            previous = self.previous.key_counts[key] / self.previous.row_count if self.previous.row_count else 0.0
+            current = self.current.key_counts[key] / self.current.row_count if self.current.row_count else 0.0
+            data[f'Previous {label}'] = [previous]
+            data[label] = [current]
+            data[f'{label} Change'] = [current - previous]
+
+        return pd.DataFrame(data)
+
+    def attribute_delta(self) -> pd.DataFrame:
+
+        attributes = self.current.attributes
+
+        previous = self.previous.attr_counts.reindex(attributes, fill_value=0)
+        current = self.current.attr_counts.reindex(attributes, fill_value=0)
+
+        def completeness(counts, key):
+            return (counts[key] / counts['count'].where(counts['count'] > 0)).fillna(0).to_numpy()
+
+        data = {'Attribute': attributes, 'Previous Count': previous['count'].to_numpy(), 'Count': current['count'].to_numpy(), 'Count Change': (current['count'] - previous['count']).to_numpy()}
+
+        for key, label in COMPLETENESS_LABELS.items():
+            data[f'Previous {label}'] = completeness(previous, key)
+            data[label] = completeness(current, key)
+            data[f'{label} Change'] = data[label] - data[f'Previous {label}']
+
+        return pd.DataFrame(data)
+
+    def values_delta(self) -> pd.DataFrame:
+
+        # Only values touched by a changed row can have moved
+
+        parts = [counts for counts in (self.incoming.value_counts, -self.outgoing.value_counts) if not counts.empty]
+
+        delta = pd.concat(parts).groupby(level=[0, 1], sort=False).sum() if parts else pd.Series(dtype='int64')
+        delta = delta[delta != 0]
+
+        if delta.empty:
+            return pd.DataFrame({'attr_name': pd.Series(dtype='str'), 'attr_values': pd.Series(dtype='str'), 'previous counts': pd.Series(dtype='int'), 'counts': pd.Series(dtype='int'), 'change': pd.Series(dtype='int')})
+
+        previous = self.previous.value_counts.reindex(delta.index, fill_value=0) if not self.previous.value_counts.empty else pd.Series(0, index=delta.index)
+
+        report = pd.DataFrame({'previous counts': previous.to_numpy(), 'counts': (previous + delta).to_numpy(), 'change': delta.to_numpy()}, index=delta.index)
+
+        report = report.rename_axis(['attr_name', 'attr_values']).reset_index()
+
+        report['order'] = report['attr_name'].map({attribute: i for i, attribute in enumerate(self.current.attributes)})
+        report['magnitude'] = report['change'].abs()
+
+        report = report.sort_values(['order', 'magnitude'], ascending=[True, False], kind='stable').reset_index(drop=True)
+
+        return report[['attr_name', 'attr_values', 'previous counts', 'counts', 'change']]
+
+class SnapshotDiffPipeline:
+
+    """Runs SnapshotDiff for every area and returns its sheets for the data report."""
+
+    def __init__(self, previous_folder_path: str, folder_path: str, areas: list, loader_options: dict = None):
+        self.previous_folder_path = previous_folder_path
+        self.folder_path = folder_path
+        self.areas = areas
+        self.loader_options = loader_options
+
+    def run_transforms(self) -> dict:
+
+        sheets = {}
+
+        completeness = []
+
+        for area in self.areas:
+
+            diff = SnapshotDiff(self.previous_folder_path, self.folder_path, area, self.loader_options).run()
+
+            print(f"step: snapshot_diff, ✅ {area}: {len(diff.added)} added, {len(diff.removed)} removed, {len(diff.modified)} modified{', previous statistics reused' if diff.reused_previous else ''}.")
+
+            completeness.append(diff.completeness_delta())
+
+            sheets[f'{area}_changes'] = diff.changes_report()
+            sheets[f'{area}_attr_delta'] = diff.attribute_delta()
+            sheets[f'{area}_values_delta'] = diff.values_delta()
+
+        excel_dict = {'completeness_delta': pd.concat(completeness, ignore_index=True)} if completeness else {}
+        excel_dict.update(sheets)
+
+        return excel_dict
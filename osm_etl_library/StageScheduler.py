@@ -0,0 +1,262 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .Instrumentation import RunReport
+
+# Classes for running pipeline stages as a dependency graph
+
+class Stage:
+
+    """A named unit of pipeline work and the stages whose outputs it needs.
+
+    run is called with a dictionary of the dependencies' outputs and the stage's run
+    report record, and returns the stage output. files lists, for an output, the files
+    the stage wrote; a checkpoint only counts while they all still exist. Stages with
+    checkpoint=False are cheap or already incremental and always run.
+    """
+
+    def __init__(self, name: str, run, deps: list = None, files = None, checkpoint: bool = True):
+        self.name = name
+        self.run = run
+        self.deps = deps or []
+        self.files = files
+        self.checkpoint = checkpoint
+
+    def output_files(self, output) -> list:
+        return self.files(output) if self.files is not None else []
+
+class StageCheckpoints:
+
+    """Pickled stage outputs under reports/checkpoints/, valid for one run version.
+
+    version identifies everything a stage output depends on (package source, run
+    configuration and input file stamps); checkpoints written under another version are
+    ignored. Each output is written atomically and recorded in checkpoints.json together
+    with the files it produced.
+    """
+
+    def __init__(self, folder_path: str, version: str):
+        self.checkpoint_path = fr"{folder_path}\reports\checkpoints"
+        self.state_path = fr"{self.checkpoint_path}\checkpoints.json"
+        self.version = version
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state.get('version') == version:
+                self.entries = state.get('stages', {})
+
+    def checkpoint_file(self, name: str) -> str:
+        return fr"{self.checkpoint_path}\{name}.pkl"
+
+    def is_current(self, name: str) -> bool:
+
+        entry = self.entries.get(name)
+
+        if entry is None or not os.path.exists(self.checkpoint_file(name)):
+            return False
+
+        return all(os.path.exists(file_path) for file_path in entry['files'])
+
+    def load(self, name: str):
+
+        with open(self.checkpoint_file(name), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, name: str, output, files: list):
+
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+
+        with open(f"{self.checkpoint_file(name)}.tmp", 'wb') as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{self.checkpoint_file(name)}.tmp", self.checkpoint_file(name))
+
+        with self._lock:
+            self.entries[name] = {'files': files}
+            self.save_state()
+
+    def discard(self, name: str):
+
+        # A stage that runs again replaces the files its checkpoint refers to
+
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self.save_state()
+
+    def save_state(self):
+
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+
+        with open(f"{self.state_path}.tmp", 'w') as f:
+            json.dump({'version': self.version, 'stages': self.entries}, f, indent=2)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+def run_version(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+class StageScheduler:
+
+    """Runs a graph of Stages, starting each one as soon as its dependencies complete.
+
+    Stages whose dependencies are all done run concurrently on up to workers threads.
+    With checkpoints, every completed stage output is saved, and with resume a stage
+    whose checkpoint is current is not run again, unless a checkpointed stage it depends
+    on has to run; its output is only read from disk when a stage that runs needs it.
+    run(targets) runs the targets and everything they depend on. A stage that raises,
+    or whose record is marked as failed, is reported and its dependants are skipped;
+    independent stages still complete.
+    """
+
+    def __init__(self, stages: list, report: RunReport, checkpoints: StageCheckpoints = None, workers: int = 1, resume: bool = False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.report = report
+        self.checkpoints = checkpoints
+        self.workers = workers
+        self.resume = resume
+        self.outputs = {}
+        self.status = {}
+
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    def plan(self, targets: list = None) -> list:
+
+        # Targets and their dependencies, in an order where every stage follows its dependencies
+
+        order = []
+        visiting = set()
+
+        def visit(name: str):
+
+            if name in order:
+                return
+
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'")
+
+            if name in visiting:
+                raise ValueError(f"Stage '{name}' is part of a dependency cycle")
+
+            visiting.add(name)
+
+            for dep in self.stages[name].deps:
+                visit(dep)
+
+            visiting.discard(name)
+            order.append(name)
+
+        for name in (targets if targets is not None else list(self.stages)):
+            visit(name)
+
+        return order
+
+    def output(self, name: str):
+
+        if name not in self.outputs:
+            self.outputs[name] = self.checkpoints.load(name)
+
+        return self.outputs[name]
+
+    def execute(self, stage: Stage, inputs: dict):
+
+        with self.report.stage(stage.name) as record:
+
+            output = stage.run(inputs, record)
+
+        # A failure reported through the record is already in the run report's errors
+
+        if record['status'] == 'error':
+            raise RuntimeError(record['error'])
+
+        if self.checkpoints is not None and stage.checkpoint:
+            self.checkpoints.save(stage.name, output, stage.output_files(output))
+
+        return output
+
+    def run(self, targets: list = None) -> dict:
+
+        order = self.plan(targets)
+
+        pending = []
+
+        for name in order:
+
+            stage = self.stages[name]
+
+            # Stages without checkpoints only prepare state (folders, indexes) and do not change outputs
+
+            rerun = [dep for dep in stage.deps if dep in pending and self.stages[dep].checkpoint]
+
+            if self.resume and stage.checkpoint and not rerun and self.checkpoints is not None and self.checkpoints.is_current(name):
+                self.status[name] = 'resumed'
+                self.report.mark(name, 'resumed')
+                print(f"step: {name}, ✅ Reusing the checkpoint of a previous run.")
+            else:
+                pending.append(name)
+
+        running = {}
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+
+            while pending or running:
+
+                for name in list(pending):
+
+                    stage = self.stages[name]
+
+                    failed = [dep for dep in stage.deps if self.status.get(dep) in ('error', 'skipped')]
+
+                    if failed:
+                        pending.remove(name)
+                        self.status[name] = 'skipped'
+                        self.report.mark(name, 'skipped')
+                        print(f"step: {name}, ❌ Skipped because '{failed[0]}' did not complete.")
+                        continue
+
+                    if len(running) >= self.workers or any(self.status.get(dep) not in ('done', 'resumed') for dep in stage.deps):
+                        continue
+
+                    try:
+                        inputs = {dep: self.output(dep) for dep in stage.deps}
+                    except Exception as e:
+                        pending.remove(name)
+                        self.status[name] = 'error'
+                        self.report.errors.append({'stage': name, 'area': None, 'error': f"Could not read checkpoint: {e}"})
+                        print(f"step: {name}, ❌ Could not read the checkpoints it needs: {e}")
+                        continue
+
+                    if self.checkpoints is not None:
+                        self.checkpoints.discard(name)
+
+                    pending.remove(name)
+                    running[executor.submit(self.execute, stage, inputs)] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+
+                    name = running.pop(future)
+
+                    try:
+                        self.outputs[name] = future.result()
+                        self.status[name] = 'done'
+                    except Exception as e:
+                        self.status[name] = 'error'
+                        print(f"step: {name}, ❌ Error: {e}")
+
+        finally:
+            executor.shutdown()
+
+        return self.outputs
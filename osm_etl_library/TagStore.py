@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+# Classes for the sparse, long-format representation of an area
+
+def _int_dtype(size: int):
+    return np.int32 if size < 2 ** 31 else np.int64
+
+class TagStore:
+
+    """An area's tags stored as (row, key, value) triples instead of a wide frame.
+
+    Only non-empty cells are kept. Triples are grouped by key, so each key is a
+    contiguous block described by key_offsets, and inside a block rows are ascending.
+    Values are integer codes into a per-key dictionary whose entries are in first-seen
+    order; feature_type is coded the same way against features. Memory and the cost of
+    per-attribute statistics therefore follow the number of non-empty cells rather than
+    rows times columns.
+
+    Values keep the type they were read with in their own table, so a numeric tag that
+    pandas would upcast to float when concatenating tables keeps its integer values.
+    """
+
+    def __init__(self, row_count: int, features: pd.Index, feature_codes: np.ndarray, keys: list, key_offsets: np.ndarray, rows: np.ndarray, value_codes: np.ndarray, values: list):
+        self.row_count = row_count
+        self.features = features
+        self.feature_codes = feature_codes
+        self.keys = keys
+        self.key_offsets = key_offsets
+        self.rows = rows
+        self.value_codes = value_codes
+        self.values = values
+        self._key_index = {key: i for i, key in enumerate(keys)}
+
+    @classmethod
+    def from_frames(cls, frames) -> 'TagStore':
+
+        # frames (tables or chunks of them) are consumed one at a time, so only one wide
+        # frame is held at once; value dictionaries grow as new values appear
+
+        row_count = 0
+        features = pd.Index([], dtype=object)
+        feature_codes = []
+        keys = []
+        key_index = {}
+        values = []
+        rows = []
+        codes = []
+
+        for df in frames:
+
+            chunk_codes, chunk_features = pd.factorize(df['feature_type'].to_numpy(), use_na_sentinel=False)
+
+            new_features = chunk_features[features.get_indexer(chunk_features) == -1]
+            features = features.append(pd.Index(new_features, dtype=object))
+            feature_codes.append(features.get_indexer(chunk_features)[chunk_codes])
+
+            for key in df.columns:
+
+                if key == 'feature_type':
+                    continue
+
+                if key not in key_index:
+                    key_index[key] = len(keys)
+                    keys.append(key)
+                    values.append(pd.Index([], dtype=object))
+                    rows.append([])
+                    codes.append([])
+
+                i = key_index[key]
+
+                column = df[key].to_numpy()
+                present = np.flatnonzero(pd.notna(column))
+
+                if not len(present):
+                    continue
+
+                present_values = column[present]
+
+                known = values[i].get_indexer(present_values)
+
+                if (known == -1).any():
+                    values[i] = values[i].append(pd.Index(pd.unique(present_values[known == -1]), dtype=object))
+                    known = values[i].get_indexer(present_values)
+
+                rows[i].append(present + row_count)
+                codes[i].append(known)
+
+            row_count += len(df)
+
+        sizes = [sum(len(block) for block in key_rows) for key_rows in rows]
+        key_offsets = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+
+        row_dtype = _int_dtype(row_count)
+
+        def flatten(blocks, dtype):
+            arrays = [array for key_blocks in blocks for array in key_blocks]
+            return np.concatenate(arrays).astype(dtype) if arrays else np.array([], dtype=dtype)
+
+        return cls(
+            row_count,
+            pd.Index(features, dtype=object),
+            np.concatenate(feature_codes).astype(_int_dtype(len(features))) if feature_codes else np.array([], dtype=np.int32),
+            keys,
+            key_offsets,
+            flatten(rows, row_dtype),
+            flatten(codes, _int_dtype(max((len(key_values) for key_values in values), default=0))),
+            [pd.Index(key_values) for key_values in values],
+        )
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @property
+    def nbytes(self) -> int:
+        arrays = self.feature_codes.nbytes + self.key_offsets.nbytes + self.rows.nbytes + self.value_codes.nbytes
+        return int(arrays + sum(key_values.memory_usage(deep=True) for key_values in self.values))
+
+    def _block(self, key: str) -> slice:
+        i = self._key_index[key]
+        return slice(self.key_offsets[i], self.key_offsets[i + 1])
+
+    def key_rows(self, key: str) -> np.ndarray:
+        if key not in self._key_index:
+            return np.array([], dtype=self.rows.dtype)
+        return self.rows[self._block(key)]
+
+    def count(self, key: str) -> int:
+        if key not in self._key_index:
+            return 0
+        block = self._block(key)
+        return int(block.stop - block.start)
+
+    def has_key(self, key: str) -> np.ndarray:
+        present = np.zeros(self.row_count, dtype=bool)
+        present[self.key_rows(key)] = True
+        return present
+
+    def feature_counts(self, key: str = None) -> np.ndarray:
+
+        # Rows per feature (in features order) that carry key, or all rows without a key
+
+        codes = self.feature_codes if key is None else self.feature_codes[self.key_rows(key)]
+
+        return np.bincount(codes, minlength=len(self.features))
+
+    def value_counts(self, key: str) -> pd.Series:
+
+        # Dictionary entries are in first-seen order, so bincount gives first-seen counts
+
+        if key not in self._key_index:
+            return pd.Series(dtype='int64')
+
+        key_values = self.values[self._key_index[key]]
+
+        counts = np.bincount(self.value_codes[self._block(key)], minlength=len(key_values))
+
+        return pd.Series(counts.astype('int64'), index=key_values)
+
+    def top_values(self, key: str, n: int) -> pd.Series:
+        return self.value_counts(key).sort_values(ascending=False, kind='stable').head(n)
+
+    def to_frame(self) -> pd.DataFrame:
+
+        # Dense reconstruction, for callers that still need the wide frame
+
+        df = pd.DataFrame({'feature_type': self.features[self.feature_codes]})
+
+        for i, key in enumerate(self.keys):
+            column = pd.Series(np.nan, index=df.index, dtype=object)
+            block = slice(self.key_offsets[i], self.key_offsets[i + 1])
+            column.iloc[self.rows[block]] = self.values[i][self.value_codes[block]]
+            df[key] = column
+
+        return df
@@ -1,7 +1,67 @@
-from .FolderCreator import AttributionFolderCreator, ChartFolderCreator, FolderCreatorPipeline
-from .DataLoader import CSVLoader
-from .DataTransformer import TransformPipelineReport, TransformPipelineCharts
-from .ChartCreator import ChartBuilderPipeline
-from .ExcelWriter import ExcelWriter
-from .ExcelFormatter import ExcelFormatterPipeline
-from .Pipeline import Pipeline
\ No newline at end of file
+# Public classes are imported on first access, so `import osm_etl_library` stays cheap and
+# pandas, openpyxl and matplotlib are only loaded by the stages that use them
+
+import sys
+from types import ModuleType
+from importlib import import_module
+
+_EXPORTS = {
+    'AttributionFolderCreator': 'FolderCreator',
+    'ChartFolderCreator': 'FolderCreator',
+    'FolderCreatorPipeline': 'FolderCreator',
+    'CSVLoader': 'DataLoader',
+    'OSMXMLLoader': 'DataLoader',
+    'AreaDataCache': 'DataCache',
+    'AreaStatistics': 'DataAggregator',
+    'ApproximateAreaStatistics': 'DataAggregator',
+    'HyperLogLog': 'Sketches',
+    'TagStore': 'TagStore',
+    'PandasBackend': 'ComputeBackend',
+    'ArrowBackend': 'ComputeBackend',
+    'SQLiteBackend': 'ComputeBackend',
+    'ApproximateBackend': 'ComputeBackend',
+    'SharedMemoryBackend': 'ComputeBackend',
+    'SharedFrameStore': 'SharedFrames',
+    'AreaIndex': 'AreaIndex',
+    'TransformPipelineReport': 'DataTransformer',
+    'TransformPipelineCharts': 'DataTransformer',
+    'ChartBuilderPipeline': 'ChartCreator',
+    'ChartImageCache': 'ChartCreator',
+    'ParallelAreaRunner': 'AreaProcessor',
+    'RunManifest': 'RunManifest',
+    'SnapshotDiff': 'SnapshotDiff',
+    'SnapshotDiffPipeline': 'SnapshotDiff',
+    'ExcelWriter': 'ExcelWriter',
+    'StreamingExcelWriter': 'ExcelWriter',
+    'ExcelFormatterPipeline': 'ExcelFormatter',
+    'SinglePassExcelFormatter': 'ExcelFormatter',
+    'RunReport': 'Instrumentation',
+    'CProfileHook': 'Instrumentation',
+    'SamplingProfilerHook': 'Instrumentation',
+    'Stage': 'StageScheduler',
+    'StageScheduler': 'StageScheduler',
+    'Pipeline': 'Pipeline',
+}
+
+__all__ = list(_EXPORTS)
+
+class _Package(ModuleType):
+
+    # Importing a submodule binds it as a package attribute, so a submodule named like its
+    # class (ExcelWriter, TagStore, Pipeline, ...) would hide the export from __getattr__;
+    # exported names are therefore resolved before any other attribute
+
+    def __getattribute__(self, name: str):
+
+        if name in _EXPORTS:
+            return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+
+        return ModuleType.__getattribute__(self, name)
+
+def __getattr__(name: str):
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+sys.modules[__name__].__class__ = _Package
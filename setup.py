@@ -9,4 +9,7 @@ setup(
         "openpyxl",
         "matplotlib"
     ],
+    extras_require={
+        "columnar": ["pyarrow"]
+    },
 )
\ No newline at end of file
@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+from osm_etl_library.AreaIndex import AreaIndex
+
+def test_first_ensure_creates_the_index_directory(tmp_path):
+
+    folder_path = str(tmp_path)
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    pd.DataFrame({'osm_id': [1, 2], 'feature_type': ['amenity', 'unknown'], 'amenity': ['cafe', None], 'name': ['A', None]}).to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+
+    database_path = os.path.join(folder_path, 'new', 'index', 'osm.sqlite')
+
+    index = AreaIndex(folder_path, database_path=database_path)
+
+    index.ensure('a')
+
+    assert os.path.exists(database_path)
+    assert index.is_current('a')
+    assert index.statistics('a').row_count == 2
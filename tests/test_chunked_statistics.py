@@ -0,0 +1,94 @@
+import os
+import pytest
+import pandas as pd
+from osm_etl_library.DataAggregator import AreaStatistics, ApproximateAreaStatistics
+from osm_etl_library.DataLoader import CSVLoader
+
+def write_tables(folder_path: str, area: str, tables: dict):
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    for table, df in tables.items():
+        df.to_csv(fr"{folder_path}\tables\{area}_{table}.csv", index=False)
+
+def test_chunks_keep_whole_table_dtypes(tmp_path):
+
+    # building is numeric for the first 3000 rows and only turns to text after the first chunks
+
+    levels = [str(i % 5) for i in range(3000)] + ['1;2', '1;2', '2']
+
+    points = pd.DataFrame({
+        'osm_id': range(len(levels)),
+        'feature_type': 'building',
+        'name': ['A' if i % 3 else None for i in range(len(levels))],
+        'building': levels,
+        'height': [float(i % 7) if i % 2 else None for i in range(len(levels))],
+    })
+
+    lines = pd.DataFrame({'osm_id': [10_000, 10_001], 'feature_type': ['highway', 'building'], 'highway': ['primary', None], 'building': [3, 4]})
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path, 'a', {'points': points, 'lines': lines})
+
+    in_memory = AreaStatistics.from_frame(CSVLoader(folder_path, 'a').load_dataframes())
+    chunked = AreaStatistics.from_chunks(CSVLoader(folder_path, 'a'), 1000)
+
+    pd.testing.assert_frame_equal(chunked.attribute_report(), in_memory.attribute_report())
+    pd.testing.assert_frame_equal(chunked.values_report(), in_memory.values_report())
+
+    assert chunked.modes().loc['building', 'Mode'] == '2'
+
+def test_chunk_dtypes_widen_numbers_and_prefer_text(tmp_path):
+
+    folder_path = str(tmp_path)
+
+    points = pd.DataFrame({'osm_id': range(2500), 'feature_type': 'amenity', 'count': [1] * 2000 + [None] * 500, 'ref': list(range(2499)) + ['A1']})
+
+    write_tables(folder_path, 'a', {'points': points})
+
+    whole = pd.read_csv(fr"{folder_path}\tables\a_points.csv", low_memory=False)
+
+    chunks = pd.concat(CSVLoader(folder_path, 'a').iter_chunks(1000), ignore_index=True)
+
+    assert chunks['count'].dtype == whole['count'].dtype
+    assert chunks['ref'].dtype == whole['ref'].dtype
+    assert chunks['ref'].tolist() == whole['ref'].tolist()
+
+def test_approximate_statistics_cannot_be_subtracted():
+
+    df = pd.DataFrame({'osm_id': [1, 2], 'feature_type': 'amenity', 'amenity': ['cafe', 'pub']})
+
+    exact = AreaStatistics.from_frame(df)
+    approximate = ApproximateAreaStatistics.from_frame(df)
+
+    with pytest.raises(TypeError, match='ApproximateAreaStatistics'):
+        approximate.subtract(exact)
+
+    with pytest.raises(TypeError, match='ApproximateAreaStatistics'):
+        exact.subtract(approximate)
+
+def test_streamed_statistics_parse_each_table_three_times(tmp_path, monkeypatch):
+
+    # feature pass, dtype pass over the full header and statistics pass; header reads are free
+
+    folder_path = str(tmp_path)
+
+    points = pd.DataFrame({'osm_id': range(50), 'feature_type': 'amenity', 'amenity': 'cafe', 'name': 'A'})
+    lines = pd.DataFrame({'osm_id': range(50), 'feature_type': 'highway', 'highway': 'service', 'ref': range(50)})
+
+    write_tables(folder_path, 'a', {'points': points, 'lines': lines})
+
+    read_csv = pd.read_csv
+    parses = []
+
+    def counted(path, *args, **kwargs):
+        if kwargs.get('nrows') != 0:
+            parses.append(path.rsplit('_', 1)[-1])
+        return read_csv(path, *args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', counted)
+
+    AreaStatistics.from_chunks(CSVLoader(folder_path, 'a'), 20)
+
+    assert sorted(parses) == ['lines.csv'] * 3 + ['points.csv'] * 3
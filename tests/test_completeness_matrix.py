@@ -0,0 +1,59 @@
+import os
+import pytest
+import pandas as pd
+import osm_etl_library.DataTransformer as DataTransformer
+from osm_etl_library.DataCache import AreaDataCache
+from osm_etl_library.DataTransformer import CompletenessMatrixTransformer
+
+def write_tables(folder_path: str):
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    points = pd.DataFrame({
+        'osm_id': range(6),
+        'feature_type': ['amenity', 'amenity', 'shop', 'shop', 'shop', 'unknown'],
+        'amenity': ['cafe', 'pub', None, None, None, None],
+        'shop': [None, None, 'bakery', 'florist', 'bakery', None],
+        'name': ['A', None, 'C', 'D', None, 'F'],
+        'website': [None, 'w', 'w', None, None, None],
+    })
+
+    lines = pd.DataFrame({'osm_id': [10, 11], 'feature_type': ['highway', 'amenity'], 'highway': ['primary', None], 'amenity': [None, 'parking'], 'name': ['High Street', None]})
+
+    points.to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+    lines.to_csv(fr"{folder_path}\tables\a_lines.csv", index=False)
+
+@pytest.mark.parametrize('backend, chunksize', [('pandas', 2), ('approximate', None), ('sqlite', None), ('arrow', None)])
+def test_matrix_comes_from_the_statistics_pass(tmp_path, monkeypatch, backend, chunksize):
+
+    if backend == 'arrow':
+        pytest.importorskip('pyarrow')
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path)
+
+    expected = CompletenessMatrixTransformer(folder_path, ['a'], AreaDataCache(folder_path)).transform()
+
+    # A second pass over the source would go through make_loader
+
+    def second_pass(*args, **kwargs):
+        raise AssertionError("the completeness matrix streamed the area again")
+
+    monkeypatch.setattr(DataTransformer, 'make_loader', second_pass)
+
+    matrix = CompletenessMatrixTransformer(folder_path, ['a'], AreaDataCache(folder_path, backend=backend), chunksize).transform()
+
+    pd.testing.assert_frame_equal(matrix, expected)
+
+def test_keys_outside_the_statistics_pass_are_streamed(tmp_path):
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path)
+
+    cache = AreaDataCache(folder_path, matrix_keys=['name'])
+
+    matrix = CompletenessMatrixTransformer(folder_path, ['a'], cache, 2, ['name', 'website']).transform()
+
+    assert matrix.set_index('Feature Type').loc['amenity', 'website Completeness'] == pytest.approx(1 / 3)
@@ -0,0 +1,17 @@
+import importlib
+import pytest
+import osm_etl_library
+
+@pytest.mark.parametrize('name', sorted(osm_etl_library._EXPORTS))
+def test_export_resolves_after_its_submodule_is_imported(name):
+
+    # Importing the submodule binds it as a package attribute with the same name as some exports
+
+    importlib.import_module(f"osm_etl_library.{osm_etl_library._EXPORTS[name]}")
+
+    namespace = {}
+    exec(f"from osm_etl_library import {name}", namespace)
+
+    assert isinstance(namespace[name], type)
+    assert namespace[name].__name__ == name
+    assert getattr(osm_etl_library, name) is namespace[name]
@@ -0,0 +1,96 @@
+import os
+import bz2
+import gzip
+import shutil
+import pytest
+import pandas as pd
+from osm_etl_library.DataAggregator import AreaStatistics, COMPLETENESS_KEYS
+from osm_etl_library.DataCache import AreaDataCache
+from osm_etl_library.DataLoader import OSMXMLLoader, make_loader
+from osm_etl_library.DataTransformer import OSMCompletenessTransformer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'small.osm')
+
+def test_elements_map_to_fme_tables_and_feature_types(tmp_path):
+
+    loader = OSMXMLLoader(str(tmp_path), 'fixture', osm_path=FIXTURE)
+
+    df = loader.load_dataframes().set_index('osm_id')
+
+    assert {table: stats['rows'] for table, stats in loader.table_stats.items() if table.startswith('fixture_')} == {
+        'fixture_points': 2, 'fixture_lines': 2, 'fixture_areas': 2, 'fixture_collections': 2,
+    }
+
+    # Untagged nodes are geometry only; rows follow the points, lines, areas, collections order
+
+    assert list(df.index) == [1, 6, 10, 12, 11, 20, 21, 22]
+
+    assert df['feature_type'].to_dict() == {
+        1: 'amenity', 6: 'unknown', 10: 'highway', 12: 'leisure', 11: 'building', 20: 'landuse', 21: 'route', 22: 'unknown',
+    }
+
+    assert df['unknown'].to_dict() == {osm_id: 'unknown' if osm_id in (6, 22) else None for osm_id in df.index}
+
+    assert df.loc[12, 'area'] == 'no'
+
+def test_completeness_keys_exist_without_matching_tags(tmp_path):
+
+    # No element carries name:en; the column still exists, as in the FME export
+
+    folder_path = str(tmp_path)
+
+    os.makedirs(fr"{folder_path}\osm", exist_ok=True)
+    shutil.copy(FIXTURE, fr"{folder_path}\osm\fixture.osm")
+
+    df = OSMXMLLoader(folder_path, 'fixture').load_dataframes()
+
+    assert set(COMPLETENESS_KEYS) <= set(df.columns)
+    assert df['name:en'].isna().all()
+
+    report = OSMCompletenessTransformer(folder_path, ['fixture'], AreaDataCache(folder_path, loader_options={'source': 'osm'})).transform()
+
+    assert report.loc[0, 'Row Count'] == 8
+    assert report.loc[0, 'Name Value Count'] == 4
+    assert report.loc[0, 'Name Value Count (eng)'] == 0
+    assert report.loc[0, 'Address Value Count (Street)'] == 2
+
+def test_streamed_statistics_parse_the_extract_once(tmp_path, monkeypatch):
+
+    parses = []
+
+    iter_elements = OSMXMLLoader.iter_elements
+
+    def counted(self):
+        parses.append(self.area)
+        return iter_elements(self)
+
+    monkeypatch.setattr(OSMXMLLoader, 'iter_elements', counted)
+
+    in_memory = AreaStatistics.from_frame(OSMXMLLoader(str(tmp_path), 'fixture', osm_path=FIXTURE).load_dataframes())
+
+    parses.clear()
+
+    streamed = AreaStatistics.from_chunks(OSMXMLLoader(str(tmp_path), 'fixture', osm_path=FIXTURE, batch_size=3), 2)
+
+    assert len(parses) == 1
+
+    pd.testing.assert_frame_equal(streamed.attribute_report(), in_memory.attribute_report())
+    pd.testing.assert_frame_equal(streamed.values_report(), in_memory.values_report())
+
+@pytest.mark.parametrize('suffix, opener', [('.gz', gzip.open), ('.bz2', bz2.open)])
+def test_compressed_extract_is_found_without_osm_path(tmp_path, suffix, opener):
+
+    folder_path = str(tmp_path)
+
+    os.makedirs(fr"{folder_path}\osm", exist_ok=True)
+
+    with open(FIXTURE, 'rb') as source, opener(fr"{folder_path}\osm\fixture.osm{suffix}", 'wb') as target:
+        shutil.copyfileobj(source, target)
+
+    loader = make_loader(folder_path, 'fixture', source='osm')
+
+    assert loader.osm_path.endswith(f"fixture.osm{suffix}")
+
+    expected = OSMXMLLoader(folder_path, 'fixture', osm_path=FIXTURE).load_dataframes()
+
+    pd.testing.assert_frame_equal(loader.load_dataframes(), expected)
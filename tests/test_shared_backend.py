@@ -0,0 +1,58 @@
+import os
+import pytest
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import osm_etl_library.AreaProcessor as AreaProcessor
+from osm_etl_library.AreaProcessor import ParallelAreaRunner
+from osm_etl_library.DataCache import AreaDataCache
+
+def write_points(folder_path: str):
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    points = pd.DataFrame({'osm_id': range(4), 'feature_type': ['amenity', 'amenity', 'shop', 'shop'], 'amenity': ['cafe', 'pub', None, None], 'shop': [None, None, 'bakery', 'bakery'], 'name': ['A', None, 'C', None]})
+    points.to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+
+def test_backend_workers_size_the_shared_pool(tmp_path):
+
+    pytest.importorskip('pyarrow')
+
+    folder_path = str(tmp_path)
+
+    write_points(folder_path)
+
+    expected = AreaDataCache(folder_path).get_statistics('a')
+
+    # One worker computes in this process, without a pool
+
+    cache = AreaDataCache(folder_path, backend='shared', backend_workers=1)
+
+    stats = cache.get_statistics('a')
+
+    assert cache.backend.workers == 1
+    assert cache.backend.executor is None
+
+    pd.testing.assert_frame_equal(stats.attribute_report(), expected.attribute_report())
+
+    assert AreaDataCache(folder_path, backend='shared', backend_workers=3).backend.workers == 3
+
+def test_area_workers_do_not_start_backend_pools(tmp_path, monkeypatch):
+
+    budgets = []
+
+    def process_area(folder_path, area, *args):
+        budgets.append(args[-1])
+        return {}
+
+    monkeypatch.setattr(AreaProcessor, 'process_area', process_area)
+    monkeypatch.setattr(AreaProcessor, 'ProcessPoolExecutor', ThreadPoolExecutor)
+
+    ParallelAreaRunner(str(tmp_path), ['a', 'b'], workers=2, backend='shared', backend_workers=8).run()
+
+    assert budgets == [1, 1]
+
+    budgets.clear()
+
+    ParallelAreaRunner(str(tmp_path), ['a', 'b'], workers=1, backend='shared', backend_workers=8).run()
+
+    assert budgets == [8, 8]
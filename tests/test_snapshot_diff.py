@@ -0,0 +1,122 @@
+import os
+import pandas as pd
+from osm_etl_library.DataAggregator import AreaStatistics
+from osm_etl_library.DataLoader import CSVLoader
+from osm_etl_library.SnapshotDiff import SnapshotDiff
+
+def export(folder_path: str, names: list, buildings: list):
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    points = pd.DataFrame({'osm_id': range(len(names)), 'feature_type': 'building', 'name': names, 'building': buildings})
+    points.to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+
+    return folder_path
+
+def write_osm(folder_path: str, elements: str) -> str:
+
+    os.makedirs(fr"{folder_path}\osm", exist_ok=True)
+
+    with open(fr"{folder_path}\osm\a.osm", 'w') as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n{elements}\n</osm>\n')
+
+    return folder_path
+
+def test_rows_are_keyed_by_table_as_well_as_id(tmp_path):
+
+    # Node 5 and way 5 are different features that happen to share an id
+
+    lines = pd.DataFrame({'osm_id': [5, 6], 'feature_type': 'highway', 'highway': ['primary', 'service']})
+
+    previous = str(tmp_path / 'previous')
+    current = str(tmp_path / 'current')
+
+    for folder_path in (previous, current):
+        os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+        lines.to_csv(fr"{folder_path}\tables\a_lines.csv", index=False)
+
+    pd.DataFrame({'osm_id': [5], 'feature_type': 'building', 'building': ['yes']}).to_csv(fr"{current}\tables\a_points.csv", index=False)
+
+    diff = SnapshotDiff(previous, current, 'a').run()
+
+    assert list(diff.added) == [('a_points', '5', 0)]
+    assert len(diff.removed) == 0 and len(diff.modified) == 0
+    assert diff.feature_changes.loc['building', 'Added'] == 1
+    assert diff.feature_changes.loc['highway'].sum() == 0
+
+def test_osm_ways_and_relations_with_one_id_stay_apart(tmp_path):
+
+    closed = '<nd ref="1"/><nd ref="2"/><nd ref="3"/><nd ref="1"/>'
+
+    way = f'<way id="5">{closed}<tag k="building" v="yes"/></way>'
+    relation = '<relation id="5"><member type="way" ref="5" role="outer"/><tag k="type" v="multipolygon"/><tag k="landuse" v="{}"/></relation>'
+
+    previous = write_osm(str(tmp_path / 'previous'), way + relation.format('forest'))
+    current = write_osm(str(tmp_path / 'current'), way + relation.format('meadow'))
+
+    diff = SnapshotDiff(previous, current, 'a', {'source': 'osm'}).run()
+
+    assert list(diff.modified) == [('relation', '5', 0)]
+    assert len(diff.added) == 0 and len(diff.removed) == 0
+
+def test_rows_without_id_are_matched_on_their_tags(tmp_path):
+
+    previous = str(tmp_path / 'previous')
+    current = str(tmp_path / 'current')
+
+    for folder_path, names in ((previous, ['A', 'B', 'C']), (current, ['A', 'B', 'D'])):
+        os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+        points = pd.DataFrame({'osm_id': [1, None, None], 'feature_type': 'amenity', 'amenity': 'cafe', 'name': names})
+        points.to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+
+    diff = SnapshotDiff(previous, current, 'a').run()
+
+    assert len(diff.modified) == 0
+    assert len(diff.added) == 1 and len(diff.removed) == 1
+    assert diff.current.row_count == 3
+
+def test_diff_reuses_statistics_of_previous_export(tmp_path, monkeypatch):
+
+    first = export(str(tmp_path / 'first'), ['A', None, 'C', None], ['yes', 'house', 'yes', 'yes'])
+    second = export(str(tmp_path / 'second'), ['A', 'B', 'C', None, 'E'], ['yes', 'house', 'garage', 'yes', 'yes'])
+    third = export(str(tmp_path / 'third'), ['A', 'B', None, 'E'], ['yes', 'shed', 'garage', 'yes'])
+
+    diff = SnapshotDiff(first, second, 'a').run()
+
+    assert not diff.reused_previous
+
+    # The second export's statistics were stored by the first diff, so nothing is aggregated in full
+
+    from_frame = AreaStatistics.from_frame
+    calls = []
+
+    def counted(cls, df):
+        calls.append(len(df))
+        return from_frame(df)
+
+    monkeypatch.setattr(AreaStatistics, 'from_frame', classmethod(counted))
+
+    diff = SnapshotDiff(second, third, 'a').run()
+
+    assert diff.reused_previous
+    assert calls == []
+
+    expected = from_frame(CSVLoader(third, 'a').load_dataframes())
+
+    pd.testing.assert_frame_equal(diff.current.attribute_report(), expected.attribute_report())
+    assert diff.current.row_count == expected.row_count == 4
+    assert diff.completeness_delta().loc[0, 'Name Completeness'] == 0.75
+
+def test_changed_source_invalidates_stored_statistics(tmp_path):
+
+    first = export(str(tmp_path / 'first'), ['A', None], ['yes', 'yes'])
+    second = export(str(tmp_path / 'second'), ['A', 'B'], ['yes', 'yes'])
+
+    SnapshotDiff(first, second, 'a').run()
+
+    export(second, ['A', 'B', 'C'], ['yes', 'yes', 'hut'])
+
+    diff = SnapshotDiff(second, first, 'a').run()
+
+    assert not diff.reused_previous
+    assert diff.previous.row_count == 3
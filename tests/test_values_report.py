@@ -0,0 +1,79 @@
+import os
+import sys
+import pytest
+import pandas as pd
+from osm_etl_library.DataTransformer import ValuesReportTransformer
+
+def write_tables(folder_path: str):
+
+    # building is numeric in the points table and text in the areas table, so the area's
+    # building column, and attr_values, mix numbers and text
+
+    os.makedirs(fr"{folder_path}\tables", exist_ok=True)
+
+    points = pd.DataFrame({'osm_id': range(5), 'feature_type': ['amenity', 'building', 'building', 'building', 'building'], 'amenity': ['cafe', None, None, None, None], 'building': [None, 3, 4, 4, 5]})
+    areas = pd.DataFrame({'osm_id': [10], 'feature_type': ['building'], 'building': ['3a']})
+
+    points.to_csv(fr"{folder_path}\tables\a_points.csv", index=False)
+    areas.to_csv(fr"{folder_path}\tables\a_areas.csv", index=False)
+
+def test_top_n_rolls_the_rest_into_other(tmp_path):
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path)
+
+    report = ValuesReportTransformer(folder_path, 'a', top_n=1).transform()
+
+    assert report[['attr_name', 'attr_values', 'counts']].values.tolist() == [
+        ['amenity', 'cafe', 1],
+        ['building', 4.0, 2],
+        ['building', 'Other (3 values)', 3],
+    ]
+
+    assert report['freq (excl NaN)'].tolist() == pytest.approx([1.0, 0.4, 0.6])
+
+def test_parquet_spill_writes_mixed_values_as_text(tmp_path):
+
+    pytest.importorskip('pyarrow')
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path)
+
+    transformer = ValuesReportTransformer(folder_path, 'a', top_n=1, spill='parquet')
+
+    sheets = transformer.sheets()
+
+    detail = pd.read_parquet(transformer.spill_path())
+
+    assert list(sheets) == ['a_values_report']
+    assert len(sheets['a_values_report']) == 3
+
+    assert detail['attr_values'].tolist() == ['cafe', '4.0', '3.0', '5.0', '3a']
+    assert detail['counts'].tolist() == [1, 2, 1, 1, 1]
+
+def test_sheets_spill_shards_the_detail(tmp_path):
+
+    folder_path = str(tmp_path)
+
+    write_tables(folder_path)
+
+    sheets = ValuesReportTransformer(folder_path, 'a', top_n=1, spill='sheets', shard_rows=2).sheets()
+
+    assert {name: len(sheet) for name, sheet in sheets.items()} == {'a_values_report': 3, 'a_values_detail': 2, 'a_values_detail_2': 2, 'a_values_detail_3': 1}
+
+    assert sheets['a_values_detail_3'].loc[0, 'attr_values'] == '3a'
+
+    # Without top_n the values report itself is sharded
+
+    sheets = ValuesReportTransformer(folder_path, 'a', spill='sheets', shard_rows=2).sheets()
+
+    assert {name: len(sheet) for name, sheet in sheets.items()} == {'a_values_report': 2, 'a_values_report_2': 2, 'a_values_report_3': 1}
+
+def test_parquet_spill_without_pyarrow(tmp_path, monkeypatch):
+
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    with pytest.raises(ImportError, match=r'osm_etl_library\[columnar\]'):
+        ValuesReportTransformer(str(tmp_path), 'a', spill='parquet')